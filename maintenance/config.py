@@ -11,42 +11,117 @@ Pour définir le proxy pour un protocol donné :
 Pour utiliser les paramètres définis dynamiquement dans les requêtes:
 
     >>> import requests
-    >>> requests.get('http://domain/some_http_request', **REQUESTS_CONFIG)
+    >>> requests.get('http://domain/some_http_request', **UserConfig.requests_config())
+
+Le dictionnaire :py:data:`REQUESTS_CONFIG` est modifié sur place
+par :py:meth:`UserConfig.set_proxy`. Il est conservé par compatibilité,
+mais ne doit pas être lu depuis plusieurs fils d'exécution.
+
+Pour ajuster le profil de performance d'un environnement
+(délais d'attente, taille du pool de connexions, etc.) :
+
+    >>> UserConfig.set_profile('prod', read_timeout=300, max_concurrency=2)
+
+Les classes qui réalisent des requêtes depuis plusieurs fils
+d'exécution utiliseront plutôt une copie figée de la configuration :
+
+    >>> config = UserConfig.requests_config()
 
 """
 
+import threading
+from copy import deepcopy
+from types import MappingProxyType
+
 LOGO_BASE = 'https://registre.data.developpement-durable.gouv.fr/logos'
 DEFAULT_LOGO = 'https://registre.data.developpement-durable.gouv.fr/logos/administration-centrale-ou-ministere.png'
 
+LOGO_TIMEOUT = (5, 15)
+"""Délais d'attente des contrôles de disponibilité des logos, en secondes.
+
+Tuple constitué du délai d'établissement de la connexion et du
+délai maximal entre deux envois de données par le serveur.
+
+"""
+
+LOGO_CACHE_MAX_AGE = 86400
+"""Durée de validité des résultats mémorisés du contrôle des logos, en secondes.
+
+Au-delà, les logos sont de nouveau contrôlés, par des requêtes
+conditionnelles lorsque le serveur a fourni un ``ETag`` ou une date
+de dernière modification.
+
+"""
+
+DEFAULT_PROFILE = {
+    'connect_timeout': 10,
+    'read_timeout': 120,
+    'pool_size': 10,
+    'max_concurrency': 4,
+    'rate_limit': None,
+    'retries': 2
+}
+"""Profil de performance par défaut des environnements.
+
+connect_timeout : float
+    Délai maximal d'établissement d'une connexion, en secondes.
+read_timeout : float
+    Délai maximal d'attente de la réponse du serveur, en secondes.
+    Certaines actions (purge, effacement en masse) peuvent être
+    longues.
+pool_size : int
+    Nombre maximal de connexions simultanément ouvertes vers
+    le serveur.
+max_concurrency : int
+    Nombre maximal de requêtes simultanées sur l'API.
+rate_limit : float or None
+    Nombre maximal de requêtes par seconde. None pour ne
+    pas limiter le débit.
+retries : int
+    Nombre de nouvelles tentatives en cas d'échec de l'établissement
+    de la connexion. Les requêtes qui ont atteint le serveur ne sont
+    jamais renvoyées.
+
+"""
+
 ECOSPHERES_ENV = [
     {
         'name': 'prod',
         'title': 'production',
-        'url': 'https://data.developpement-durable.gouv.fr'
+        'url': 'https://data.developpement-durable.gouv.fr',
+        'rate_limit': 10
     },
     {
         'name': 'preprod',
         'title': 'pré-production',
         'url': 'https://preprod.data.developpement-durable.gouv.fr',
-        'verify': False
+        'verify': False,
+        'rate_limit': 10
     },
     {
         'name': 'integration',
         'title': 'intégration (distant)',
         'url': 'https://integration.data.e2.rie.gouv.fr',
-        'verify': False
+        'verify': False,
+        'max_concurrency': 2
     },
     {
         'name': 'dev',
         'title': 'développement (distant)',
         'url': 'https://dev.data.developpement-durable.gouv.fr',
-        'verify': False
+        'verify': False,
+        'max_concurrency': 2
     },
     {
         'name': 'local',
         'title': 'développement (local)',
         'url': 'http://localhost:5000',
-        'verify': False
+        'verify': False,
+        'connect_timeout': 2,
+        'read_timeout': 600,
+        'pool_size': 2,
+        'max_concurrency': 2,
+        'retries': 0
     }
 ]
 """Définition des environnements disponibles.
@@ -56,6 +131,11 @@ environnement avec des certificats SSL auto-signés. Cela aura pour effet
 d'inhiber la vérification des certificats lors de l'utilisation de l'API
 sur ces environnements.
 
+Chaque environnement peut par ailleurs redéfinir tout ou partie des
+paramètres du profil de performance, cf. :py:data:`DEFAULT_PROFILE`.
+Ceux-ci peuvent encore être modifiés en cours de session avec
+:py:meth:`UserConfig.set_profile`.
+
 Pour utiliser l'API pour les opérations de maintenance sur l'environnement
 considéré, il faudra copier un jeton d'API valide dans un fichier ``.txt``
 portant le même nom ``name`` que l'environnement et placé dans ``maintenance/token``.
@@ -66,10 +146,108 @@ class UserConfig:
     """Interface pour la mise à jour dynamique de la configuration.
 
     À date, permet notamment de définir le proxy pour les
-    requêtes HTTP/HTTPS.
+    requêtes HTTP/HTTPS et d'ajuster les profils de performance
+    des environnements.
+
+    Les modifications sont sérialisées par un verrou, et
+    chacune produit une nouvelle copie figée de la configuration,
+    cf. :py:meth:`UserConfig.requests_config`.
 
     """
     _REQUESTS_CONFIG = {}
+    _LOCK = threading.Lock()
+    _SNAPSHOT = MappingProxyType({})
+    _PROFILES = {}
+    _OVERRIDES = {}
+
+    @classmethod
+    def profile(cls, env_name):
+        """Renvoie le profil de performance d'un environnement.
+
+        Le profil combine, par ordre de priorité croissante,
+        :py:data:`DEFAULT_PROFILE`, les paramètres déclarés
+        pour l'environnement dans :py:data:`ECOSPHERES_ENV` et
+        ceux définis par :py:meth:`UserConfig.set_profile`.
+
+        Parameters
+        ----------
+        env_name : str
+            Le nom de l'environnement. S'il n'est pas défini par
+            :py:data:`ECOSPHERES_ENV`, seuls les paramètres par
+            défaut et ceux de :py:meth:`UserConfig.set_profile`
+            sont pris en compte.
+
+        Returns
+        -------
+        types.MappingProxyType
+            Copie figée du profil.
+
+        """
+        with cls._LOCK:
+            return cls._PROFILES.get(env_name) or cls._build_profile(env_name)
+
+    @classmethod
+    def set_profile(cls, env_name, **settings):
+        """Modifie le profil de performance d'un environnement.
+
+        Parameters
+        ----------
+        env_name : str
+            Le nom de l'environnement.
+        **settings
+            Les paramètres à modifier, cf. :py:data:`DEFAULT_PROFILE`.
+            Un paramètre valant None reprend la valeur déclarée
+            pour l'environnement dans :py:data:`ECOSPHERES_ENV`
+            ou, à défaut, sa valeur par défaut, à l'exception de
+            ``rate_limit``, pour lequel None signifie que le débit
+            n'est pas limité.
+
+        Raises
+        ------
+        ValueError
+            Si un paramètre est inconnu.
+
+        """
+        for key in settings:
+            if not key in DEFAULT_PROFILE:
+                raise ValueError(f'paramètre de profil inconnu "{key}"')
+        with cls._LOCK:
+            overrides = cls._OVERRIDES.setdefault(env_name, {})
+            for key, value in settings.items():
+                if value is None and key != 'rate_limit':
+                    overrides.pop(key, None)
+                else:
+                    overrides[key] = value
+            cls._PROFILES[env_name] = cls._build_profile(env_name)
+
+    @classmethod
+    def _build_profile(cls, env_name):
+        profile = DEFAULT_PROFILE.copy()
+        for env in ECOSPHERES_ENV:
+            if env['name'] == env_name:
+                profile.update({
+                    key: value for key, value in env.items()
+                    if key in DEFAULT_PROFILE
+                })
+        profile.update(cls._OVERRIDES.get(env_name, {}))
+        return MappingProxyType(profile)
+
+    @classmethod
+    def requests_config(cls):
+        """Renvoie une copie figée des paramètres des requêtes.
+
+        Contrairement à :py:data:`REQUESTS_CONFIG`, l'objet
+        renvoyé n'est jamais modifié. Il peut être lu sans
+        précaution depuis plusieurs fils d'exécution, et conservé
+        pour garantir que toutes les requêtes d'un traitement
+        utilisent les mêmes paramètres.
+
+        Returns
+        -------
+        types.MappingProxyType
+
+        """
+        return cls._SNAPSHOT
 
     @classmethod
     def http_proxy(cls):
@@ -111,6 +289,12 @@ class UserConfig:
         protocols = [
             p for p in ('http', 'https') if not protocol or p == protocol
         ]
+        with cls._LOCK:
+            cls._set_proxy(value, protocols)
+            cls._SNAPSHOT = MappingProxyType(deepcopy(cls._REQUESTS_CONFIG))
+
+    @classmethod
+    def _set_proxy(cls, value, protocols):
         for p in protocols:
             if not 'proxies' in cls._REQUESTS_CONFIG:
                 if not value:
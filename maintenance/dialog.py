@@ -48,13 +48,19 @@ Gestion des moissonnages avec l'API CKAN via ckan-harvest :
 https://github.com/ckan/ckanext-harvest/blob/master/ckanext/harvest/logic/action
 
 """
-import requests, json, warnings, re
+import requests, json, warnings, re, heapq, threading
+from collections import deque
+from datetime import datetime
+from math import ceil
 from pathlib import Path
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from urllib3.exceptions import InsecureRequestWarning
-from time import localtime, strftime, sleep
+from urllib3.util.retry import Retry
+from time import localtime, strftime, sleep, monotonic
 
 from maintenance.config import (
-    ECOSPHERES_ENV, REQUESTS_CONFIG
+    ECOSPHERES_ENV, UserConfig
 )
 from maintenance.organization import Organization
 from maintenance import __path__
@@ -114,6 +120,24 @@ class CkanEnv:
         Jeton d'API pour l'instance CKAN.
     verify : bool
         La validité du certificat serveur doit-elle être contrôlée ?
+
+    Notes
+    -----
+    Les méthodes peuvent être appelées simultanément depuis
+    plusieurs fils d'exécution. Chaque fil dispose de sa
+    propre session HTTP, et les paramètres des requêtes (proxies)
+    sont lus à chaque requête dans la copie figée courante de la
+    configuration, cf. :py:meth:`maintenance.config.UserConfig.requests_config`.
+    Les modifications de la configuration, par exemple via
+    :py:meth:`maintenance.config.UserConfig.set_proxy`, sont
+    ainsi prises en compte dès la requête suivante.
+
+    Les délais d'attente, la taille du pool de connexions, le nombre
+    maximal de requêtes simultanées, le débit et le nombre de nouvelles
+    tentatives sont définis par le profil de performance de
+    l'environnement, cf. :py:meth:`maintenance.config.UserConfig.profile`.
+    Les modifications du profil en cours de session sont prises
+    en compte dès la requête suivante.
     
     """
     def __init__(self, name, title, url, api_token=None, verify=True):
@@ -122,6 +146,109 @@ class CkanEnv:
         self.url = url
         self.api_token = api_token
         self.verify = verify
+        self._local = threading.local()
+        self._transport_lock = threading.Lock()
+        self._transport = None
+        self._next_request = 0
+        if not verify:
+            ignore_insecure_warnings(url)
+
+    @property
+    def session(self):
+        """requests.Session: Session HTTP du fil d'exécution courant."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    @property
+    def profile(self):
+        """types.MappingProxyType: Profil de performance de l'environnement.
+        
+        Cf. :py:data:`maintenance.config.DEFAULT_PROFILE`.
+
+        """
+        return UserConfig.profile(self.name)
+
+    def _transport_for(self, profile):
+        """Renvoie l'adaptateur HTTP et le sémaphore correspondant au profil.
+
+        Ils sont partagés par tous les fils d'exécution, et
+        recréés lorsque le profil change.
+
+        Parameters
+        ----------
+        profile : types.MappingProxyType
+            Le profil de performance.
+
+        Returns
+        -------
+        tuple(requests.adapters.HTTPAdapter, threading.BoundedSemaphore)
+
+        """
+        with self._transport_lock:
+            if self._transport is None or self._transport[0] != profile:
+                retry = Retry(
+                    total=profile['retries'],
+                    connect=profile['retries'],
+                    read=0,
+                    status=0,
+                    other=0,
+                    backoff_factor=0.5
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=profile['pool_size'],
+                    max_retries=retry,
+                    pool_block=True
+                )
+                semaphore = threading.BoundedSemaphore(profile['max_concurrency'])
+                self._transport = (profile, adapter, semaphore)
+            return self._transport[1:]
+
+    def _throttle(self, profile):
+        """Attend, si nécessaire, pour respecter le débit maximal du profil."""
+        if not profile['rate_limit']:
+            return
+        with self._transport_lock:
+            now = monotonic()
+            start = max(now, self._next_request)
+            self._next_request = start + 1 / profile['rate_limit']
+        if start > now:
+            sleep(start - now)
+
+    def _post(self, url, json_data):
+        """Envoie une requête POST selon le profil de l'environnement.
+
+        Parameters
+        ----------
+        url : str
+            L'URL.
+        json_data : dict or None
+            Le corps de la requête.
+
+        Returns
+        -------
+        requests.Response
+
+        """
+        profile = self.profile
+        adapter, semaphore = self._transport_for(profile)
+        session = self.session
+        if getattr(self._local, 'adapter', None) is not adapter:
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.adapter = adapter
+        self._throttle(profile)
+        with semaphore:
+            return session.post(
+                url,
+                json=json_data,
+                headers={ "Authorization": self.api_token },
+                verify=self.verify,
+                timeout=(profile['connect_timeout'], profile['read_timeout']),
+                **UserConfig.requests_config()
+                )
 
     def get_org_collection(self, force_update=False):
         """Renvoie le répertoire des organisations, en le rechargeant si nécessaire.
@@ -136,12 +263,17 @@ class CkanEnv:
         Returns
         -------
         dict
+            Le répertoire. Il n'est jamais modifié sur place,
+            cf. :py:mod:`maintenance.registry`.
 
         """
         if not force_update and Organization.COLLECTION:
             return Organization.COLLECTION
-        Organization.load()
-        return Organization.COLLECTION
+        with Organization._LOCK:
+            # un autre fil a pu charger le répertoire entre-temps
+            if force_update or not Organization.COLLECTION:
+                Organization.load()
+            return Organization.COLLECTION
 
     def refresh_orgs(self, verbose=True, strict=False):
         """Met à jour toutes les organisations de l'instance selon le répertoire.
@@ -265,8 +397,10 @@ class CkanEnv:
 
         return None if action_success(r) else r
 
-    def refresh_harvest_sources(self, re_run=False, sleep_duration=5,
-        verbose=True, strict=False):
+    def refresh_harvest_sources(self, re_run=False, sleep_duration=None,
+        max_gathers=1, max_gathers_per_host=1, poll_interval=2,
+        gather_timeout=900, max_gather_timeouts=3, verbose=True,
+        strict=False):
         """Met à jour tous les moissonnages de l'instance selon le répertoire.
 
         Les nouveaux moissonnages du répertoire sont créés sur l'instance,
@@ -281,10 +415,30 @@ class CkanEnv:
             pré-existants. À noter que si `re_run` vaut False, les nouveaux
             moissonnages seront de toute façon exécutés au prochain
             déclenchement du cron.
-        sleep_duration : float, default 5
-            Durée de la pause entre deux lancements de moissonnages,
-            en secondes. Ignoré si `re_run` vaut False. Cf.
-            :py:meth:`CkanEnv.run_all_harvest_jobs` pour plus de détails.
+        sleep_duration : float, optional
+            Si spécifié, les moissonnages sont lancés à intervalle
+            fixe (durée de la pause entre deux lancements, en secondes)
+            au lieu d'être ordonnancés selon l'avancement de leur phase
+            *gather*. Ignoré si `re_run` vaut False.
+        max_gathers : int, default 1
+            Nombre maximal de phases *gather* simultanées. Ignoré si
+            `re_run` vaut False ou si `sleep_duration` est spécifié.
+        max_gathers_per_host : int, default 1
+            Nombre maximal de phases *gather* simultanées sur un même
+            serveur source. Ignoré si `re_run` vaut False ou si
+            `sleep_duration` est spécifié.
+        poll_interval : float, default 2
+            Intervalle entre deux interrogations de l'API sur l'état
+            des tâches en cours, en secondes.
+        gather_timeout : float, default 900
+            Durée, en secondes, au-delà de laquelle une phase *gather*
+            qui ne s'achève pas cesse de bloquer les lancements
+            suivants.
+        max_gather_timeouts : int, default 3
+            Nombre de phases *gather* consécutives ayant dépassé
+            `gather_timeout` au-delà duquel plus aucun moissonnage
+            n'est lancé, les processus de collecte étant vraisemblablement
+            arrêtés. None pour ne jamais interrompre les lancements.
         verbose : bool, default True
             Si True, les actions réalisées sont imprimées au fur et à
             mesure dans la console.
@@ -293,6 +447,10 @@ class CkanEnv:
             Si False, elles sont ignorées, silencieusement ou non selon
             la valeur de `verbose`.
 
+        See Also
+        --------
+        CkanEnv.run_harvest_jobs
+
         """
         # ----- liste des moissonnages de l'instance ------
         ckan_harvest = self.harvest_sources_list('both')
@@ -304,6 +462,7 @@ class CkanEnv:
         # ------ créations et mises à jour ------
         # création ou mise à jour des moissonnages
         # du répertoire
+        to_run = []
         for harvest_name in ( harvest_collection.keys() if not \
             re_run else reversed(harvest_collection.keys()) ):
             
@@ -333,22 +492,29 @@ class CkanEnv:
                     'créé' if a == 'create' else 'mis à jour'
                     ))
 
-            # lancement de la tâche de moissonnage
-            # NB : si le cron s'est exécuté entre la création
-            # du nouveau moissonnage et l'exécution de cette
-            # partie, il pourrait y avoir une erreur ici
-            if re_run:
-                r = self.run_harvest_job(harvest_name=harvest_name,
-                    harvest_id=harvest_id)
-                if r is not None:
-                    m = "{} : échec du lancement de la tâche de" \
-                        " moissonnage.".format(harvest_name)
-                    if verbose:
-                        print(m)
-                    if strict:
-                        raise DialogError(m)
-                elif sleep_duration:
-                    sleep(sleep_duration)
+            if re_run and r is None:
+                to_run.append((
+                    harvest_name,
+                    harvest_id,
+                    harvest_collection[harvest_name].get('url')
+                ))
+
+        # ------ lancement des tâches de moissonnage ------
+        # NB : si le cron s'est exécuté entre la création
+        # d'un nouveau moissonnage et l'exécution de cette
+        # partie, il pourrait y avoir une erreur ici
+        if to_run:
+            self.run_harvest_jobs(
+                to_run,
+                sleep_duration=sleep_duration,
+                max_gathers=max_gathers,
+                max_gathers_per_host=max_gathers_per_host,
+                poll_interval=poll_interval,
+                gather_timeout=gather_timeout,
+                max_gather_timeouts=max_gather_timeouts,
+                verbose=verbose,
+                strict=strict
+            )
 
         # ------ suppression ------
         # suppression des moissonnages qui ont disparu du
@@ -658,22 +824,18 @@ class CkanEnv:
         Returns
         -------
         requests.Response
-            Le résultat renvoyé par requests.
+            Le résultat renvoyé par requests. En cas d'échec de la
+            connexion ou de dépassement des délais d'attente du
+            profil de l'environnement, une réponse en erreur est
+            construite, cf. :py:func:`failed_response`, de sorte que
+            l'échec soit traité comme celui de l'action.
         
         """
-        with warnings.catch_warnings():
-            if not self.verify:
-                warnings.simplefilter("ignore", category=InsecureRequestWarning)
-                # pour les avertissements sur la non-vérification
-                # des certificats, qui apparaissent sinon à chaque requête
-                # envoyée à l'API
-            return requests.post(
-                "{}/api/3/action/{}".format(self.url, api_action),
-                json=data_dict,
-                headers={ "Authorization": self.api_token },
-                verify=self.verify,
-                **REQUESTS_CONFIG
-                )
+        url = "{}/api/3/action/{}".format(self.url, api_action)
+        try:
+            return self._post(url, data_dict)
+        except requests.RequestException as err:
+            return failed_response(url, err)
     
     def load_vocabulary(self, vocabularies=None):
         """Lance une requête d'action sur l'API de l'instance CKAN.
@@ -692,27 +854,30 @@ class CkanEnv:
         """
         if isinstance(vocabularies, str):
             vocabularies = [vocabularies]
-        with warnings.catch_warnings():
-            if not self.verify:
-                warnings.simplefilter("ignore", category=InsecureRequestWarning)
-                # pour les avertissements sur la non-vérification
-                # des certificats, qui apparaissent sinon à chaque requête
-                # envoyée à l'API
-            return requests.post(
-                f"{self.url}/api/load-vocab",
-                json={'vocab_list': vocabularies} if vocabularies else {},
-                headers={ "Authorization": self.api_token },
-                verify=self.verify,
-                **REQUESTS_CONFIG
-                )
+        return self._post(
+            f"{self.url}/api/load-vocab",
+            {'vocab_list': vocabularies} if vocabularies else {}
+            )
 
-    def read_harvest_log(self, limit=10):
+    def read_harvest_log(self, limit=10, level=None, follow=False,
+        poll_interval=5):
         """Affiche les logs de moissonnage dans la console.
 
         Parameters
         ----------
         limit : int, default 10
-            Nombre de lignes de log à afficher.
+            Nombre de lignes de log à afficher. En mode `follow`,
+            nombre de lignes affichées avant le suivi des nouvelles
+            entrées.
+        level : {'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'}, optional
+            Si spécifié, seules les entrées de ce niveau sont
+            affichées.
+        follow : bool, default False
+            Si True, les nouvelles entrées sont affichées au fur et
+            à mesure, jusqu'à interruption (Ctrl+C).
+        poll_interval : float, default 5
+            En mode `follow`, intervalle entre deux interrogations
+            de l'API, en secondes.
 
         Returns
         -------
@@ -721,25 +886,204 @@ class CkanEnv:
         requests.Response
             En cas d'échec.
         
+        See Also
+        --------
+        CkanEnv.harvest_log
+
         """
-        r = self.action_request(
-            api_action='harvest_log_list'
-        )
+        try:
+            for entry in self.harvest_log(level=level, limit=limit,
+                follow=follow, poll_interval=poll_interval):
+                print(json.dumps(entry))
+        except DialogError as err:
+            return err.response
+        except KeyboardInterrupt:
+            return
+
+    def harvest_log(self, level=None, limit=10, offset=0, follow=False,
+        poll_interval=5, page_size=100, probe_size=5):
+        """Générateur sur les logs de moissonnage.
+
+        La pagination et le filtrage sur le niveau sont réalisés par
+        l'API (``harvest_log_list``), seules les entrées demandées
+        sont transférées.
+
+        Parameters
+        ----------
+        level : {'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'}, optional
+            Si spécifié, seules les entrées de ce niveau sont
+            considérées.
+        limit : int or None, default 10
+            Nombre maximal d'entrées renvoyées (hors mode `follow`,
+            ou avant le suivi des nouvelles entrées en mode `follow`).
+            None pour toutes les entrées.
+        offset : int, default 0
+            Nombre d'entrées les plus récentes à ignorer. Ignoré en
+            mode `follow`.
+        follow : bool, default False
+            Si True, le générateur renvoie ensuite indéfiniment les
+            nouvelles entrées, au fur et à mesure de leur création.
+            Seules les entrées plus récentes que la dernière entrée
+            vue sont demandées à l'API.
+        poll_interval : float, default 5
+            En mode `follow`, intervalle entre deux interrogations
+            de l'API, en secondes.
+        page_size : int, default 100
+            Nombre maximal d'entrées demandées par requête.
+        probe_size : int, default 5
+            En mode `follow`, nombre d'entrées demandées par la
+            première requête de chaque interrogation. Des pages
+            supplémentaires (de `page_size` entrées) ne sont
+            demandées que si toutes ces entrées sont nouvelles.
+
+        Yields
+        ------
+        dict
+            Une entrée du log, avec notamment les clés ``'id'``,
+            ``'level'``, ``'content'`` et ``'created'``. Hors mode
+            `follow`, les entrées sont renvoyées de la plus récente
+            à la plus ancienne. En mode `follow`, dans l'ordre
+            chronologique.
+
+        Raises
+        ------
+        DialogError
+            En cas d'échec d'une requête sur l'API. La réponse de
+            requests est disponible via l'attribut `response` de
+            l'exception.
+
+        """
+        if not follow:
+            n = 0
+            while limit is None or n < limit:
+                size = page_size if limit is None \
+                    else min(page_size, limit - n)
+                page = self._harvest_log_page(level, size, offset + n)
+                for entry in page:
+                    yield entry
+                n += len(page)
+                if len(page) < size:
+                    break
+            return
+
+        # ------ mode follow ------
+        page = self._harvest_log_page(level, limit or page_size, 0) \
+            if limit != 0 else self._harvest_log_page(level, 1, 0)
+        last = page[0] if page else None
+        # identifiants des entrées vues ayant la date de création
+        # de la plus récente (plusieurs entrées peuvent être créées
+        # au même instant)
+        seen = {e['id'] for e in page if last and \
+            e['created'] == last['created']}
+        if limit != 0:
+            for entry in reversed(page):
+                yield entry
+
+        while True:
+            sleep(poll_interval)
+            new = []
+            n = 0
+            # une petite page suffit le plus souvent à constater
+            # qu'il n'y a pas, ou peu, de nouvelles entrées
+            size = min(probe_size, page_size)
+            while True:
+                page = self._harvest_log_page(level, size, n)
+                for entry in page:
+                    if last and (entry['created'] < last['created'] or \
+                        entry['created'] == last['created'] and \
+                        entry['id'] in seen):
+                        break
+                    new.append(entry)
+                else:
+                    if len(page) == size:
+                        n += size
+                        size = page_size
+                        continue
+                break
+            if not new:
+                continue
+            if last and new[0]['created'] == last['created']:
+                seen |= {e['id'] for e in new if \
+                    e['created'] == last['created']}
+            else:
+                last = new[0]
+                seen = {e['id'] for e in new if \
+                    e['created'] == last['created']}
+            for entry in reversed(new):
+                yield entry
+
+    def _harvest_log_page(self, level, limit, offset):
+        """Renvoie une page des logs de moissonnage.
+
+        Parameters
+        ----------
+        level : str or None
+            Le niveau des entrées, ou None pour tous les niveaux.
+        limit : int
+            Nombre maximal d'entrées.
+        offset : int
+            Nombre d'entrées les plus récentes à ignorer.
+
+        Returns
+        -------
+        list(dict)
+
+        Raises
+        ------
+        DialogError
+            En cas d'échec de la requête sur l'API.
+
+        """
+        data_dict = {'limit': limit, 'offset': offset}
+        if level:
+            data_dict['level'] = level
+        r = self.action_request('harvest_log_list', data_dict)
         if not action_success(r):
-            return r
-        j = r.json()['result']
-        for k in range(min(limit, len(j))):
-            print(json.dumps(j[k]))
+            raise DialogError("Echec de la récupération des logs" \
+                " de moissonnage.", response=r)
+        return r.json()['result'] or []
 
-    def run_all_harvest_jobs(self, sleep_duration=5,
+    def run_all_harvest_jobs(self, sleep_duration=None, max_gathers=1,
+        max_gathers_per_host=1, poll_interval=2, gather_timeout=900,
+        max_gather_timeouts=3, order='registry', history=None,
         verbose=True, strict=False):
         """Relance tous les moissonnages dans l'ordre du répertoire.
 
         Parameters
         ----------
-        sleep_duration : float, default 5
-            Durée de la pause entre deux lancements de moissonnages,
-            en secondes.
+        sleep_duration : float, optional
+            Si spécifié, les moissonnages sont lancés à intervalle
+            fixe (durée de la pause entre deux lancements, en secondes)
+            au lieu d'être ordonnancés selon l'avancement de leur phase
+            *gather*.
+        max_gathers : int, default 1
+            Nombre maximal de phases *gather* simultanées.
+        max_gathers_per_host : int, default 1
+            Nombre maximal de phases *gather* simultanées sur un même
+            serveur source.
+        poll_interval : float, default 2
+            Intervalle entre deux interrogations de l'API sur l'état
+            des tâches en cours, en secondes.
+        gather_timeout : float, default 900
+            Durée, en secondes, au-delà de laquelle une phase *gather*
+            qui ne s'achève pas cesse de bloquer les lancements
+            suivants.
+        max_gather_timeouts : int, default 3
+            Nombre de phases *gather* consécutives ayant dépassé
+            `gather_timeout` au-delà duquel plus aucun moissonnage
+            n'est lancé, les processus de collecte étant vraisemblablement
+            arrêtés. None pour ne jamais interrompre les lancements.
+        order : {'registry', 'history'}, default 'registry'
+            Stratégie d'ordonnancement. Avec ``'registry'``, les
+            moissonnages sont lancés dans l'ordre du répertoire. Avec
+            ``'history'``, les moissonnages les plus longs d'après
+            l'historique sont lancés en premier, sous réserve des
+            contraintes d'ordre décrites par :py:func:`order_harvests`.
+        history : dict, optional
+            Historique des moissonnages, tel que renvoyé par
+            :py:meth:`CkanEnv.harvest_history`. Ignoré si `order` vaut
+            ``'registry'``. S'il n'est pas fourni, il est obtenu
+            par des requêtes sur l'API.
         verbose : bool, default True
             Si True, les actions réalisées sont imprimées au fur et à
             mesure dans la console.
@@ -758,26 +1102,24 @@ class CkanEnv:
 
         Notes
         -----
-        `sleep_duration` permet d'espacer les ordres déclenchement des
-        moissonnages, pour accroître les chances qu'ils s'exécutent
-        dans le bon ordre. `sleep_duration` doit avoir une durée
-        suffisante pour couvrir la phase *gather* du moissonnage,
-        afin que l'ordre de lancement des phases *fetch* (sans
-        parallélisme) reste identique à celui du lancement des phases
-        *gather* (avec parallélisme). Il n'est pas possible de contrôler
-        la fin effective de la phase *gather* via l'API
-        (``harvest_source_show_status``), car il y a un délai conséquent
-        sur la mise à jour de cette information.
-
         Les moissonages hors répertoire ne sont (silencieusement) pas
         exécutés. Les moissonnages du répertoire qui n'existent pas
         sur l'instance provoquent des messages ou des erreurs selon
         `verbose` et `strict`.
 
+        See Also
+        --------
+        CkanEnv.run_harvest_jobs
+
         """
+        if not order in ('registry', 'history'):
+            raise ValueError("Stratégie d'ordonnancement inconnue" \
+                " '{}'.".format(order))
+
         ckan_harvest = self.harvest_sources_list('both')
         harvest_collection = json_import('moissonnages.json')
 
+        to_run = []
         for harvest_name in reversed(harvest_collection.keys()):
             # on prend la liste à l'envers, car ici les tâches
             # seront exécutées dans l'ordre où on les lance,
@@ -791,22 +1133,214 @@ class CkanEnv:
                 if strict:
                     raise ValueError(m)
             else:
-                r = self.run_harvest_job(
-                    harvest_id=ckan_harvest[harvest_name])
-                if r is not None:
+                to_run.append((
+                    harvest_name,
+                    ckan_harvest[harvest_name],
+                    harvest_collection[harvest_name].get('url')
+                ))
+
+        if order == 'history' and to_run:
+            if history is None:
+                history = self.harvest_history(
+                    {e[0]: e[1] for e in to_run})
+            try:
+                ordered_urls = json_import(
+                    'organisations/serveurs_csw_ordre.json')
+            except FileNotFoundError:
+                ordered_urls = []
+            names = order_harvests(
+                [e[0] for e in to_run],
+                harvest_collection,
+                history=history,
+                ordered_urls=ordered_urls
+            )
+            d = {e[0]: e for e in to_run}
+            to_run = [d[harvest_name] for harvest_name in names]
+
+        return self.run_harvest_jobs(
+            to_run,
+            sleep_duration=sleep_duration,
+            max_gathers=max_gathers,
+            max_gathers_per_host=max_gathers_per_host,
+            poll_interval=poll_interval,
+            gather_timeout=gather_timeout,
+            max_gather_timeouts=max_gather_timeouts,
+            verbose=verbose,
+            strict=strict
+        )
+
+    def run_harvest_jobs(self, harvests, sleep_duration=None, max_gathers=1,
+        max_gathers_per_host=1, poll_interval=2, gather_timeout=900,
+        max_gather_timeouts=3, verbose=True, strict=False):
+        """Lance des moissonnages dans l'ordre, selon l'avancement de leurs phases *gather*.
+
+        Un moissonnage n'est lancé que lorsque le nombre de phases
+        *gather* en cours (toutes sources confondues et pour son
+        serveur source) est inférieur aux limites fixées. L'état des
+        tâches est suivi via ``harvest_job_show``.
+
+        Parameters
+        ----------
+        harvests : list(tuple)
+            Les moissonnages à lancer, dans l'ordre de lancement.
+            Chaque tuple est constitué de :
+
+            * ``[0]`` l'identifiant (`name`) du moissonnage.
+            * ``[1]`` l'identifiant technique CKAN (`id`) du
+              moissonnage, ou None s'il doit être déduit de `name`.
+            * ``[2]`` l'URL du serveur moissonné, ou None.
+
+        sleep_duration : float, optional
+            Si spécifié, les moissonnages sont lancés à intervalle
+            fixe (durée de la pause entre deux lancements, en secondes),
+            sans suivi de l'état des tâches.
+        max_gathers : int, default 1
+            Nombre maximal de phases *gather* simultanées.
+        max_gathers_per_host : int, default 1
+            Nombre maximal de phases *gather* simultanées sur un même
+            serveur source.
+        poll_interval : float, default 2
+            Intervalle entre deux interrogations de l'API sur l'état
+            des tâches en cours, en secondes.
+        gather_timeout : float, default 900
+            Durée, en secondes, au-delà de laquelle une phase *gather*
+            qui ne s'achève pas cesse de bloquer les lancements
+            suivants.
+        max_gather_timeouts : int, default 3
+            Nombre de phases *gather* consécutives ayant dépassé
+            `gather_timeout` au-delà duquel plus aucun moissonnage
+            n'est lancé, les processus de collecte étant vraisemblablement
+            arrêtés. None pour ne jamais interrompre les lancements.
+        verbose : bool, default True
+            Si True, les actions réalisées sont imprimées au fur et à
+            mesure dans la console.
+        strict : bool, default False
+            Si True, les anomalies rencontrées provoquent des erreurs.
+            Si False, elles sont ignorées, silencieusement ou non selon
+            la valeur de `verbose`.
+
+        Returns
+        -------
+        None
+            Si l'action a réussi.
+        requests.Response
+            En cas d'échec. Il s'agit de la première réponse reçue
+            de l'API qui était porteuse d'une erreur.
+
+        Notes
+        -----
+        Les phases *fetch* s'exécutent sans parallélisme, dans
+        l'ordre où s'achèvent les phases *gather*. Avec
+        ``max_gathers=1``, chaque moissonnage n'est lancé qu'une fois
+        la phase *gather* du précédent terminée, ce qui garantit que
+        l'ordre des phases *fetch* est celui du lancement, sans pause
+        superflue. Au-delà, l'ordre n'est plus garanti que de manière
+        approximative.
+
+        Les lancements se font toujours dans l'ordre de `harvests` :
+        un moissonnage bloqué par la limite propre à son serveur
+        retarde les suivants.
+
+        Contrairement à ``harvest_source_show_status``, dont la mise à
+        jour est différée, ``harvest_job_show`` rend compte immédiatement
+        de l'avancement des tâches.
+
+        """
+        r_error = None
+
+        # tâches en phase gather : id de la tâche -> (name, serveur,
+        # valeur de gather_started avant lancement, heure de lancement)
+        gathering = {}
+        pending = list(harvests)
+        # nombre de phases gather consécutives ayant
+        # dépassé le délai d'attente
+        timeouts = 0
+
+        while pending or gathering:
+
+            # ------ suivi des tâches en cours ------
+            for job_id, (harvest_name, host, baseline, launched) \
+                in list(gathering.items()):
+                r = self.action_request('harvest_job_show', {'id': job_id})
+                if not action_success(r):
+                    # on ne bloque pas les lancements suivants
+                    # sur une tâche dont on ignore l'état
+                    del gathering[job_id]
+                    if verbose:
+                        print("{} : échec du suivi de la tâche de" \
+                            " moissonnage.".format(harvest_name))
+                    continue
+                phase = harvest_job_phase(r.json()['result'], baseline)
+                if phase in ('fetch', 'finished'):
+                    del gathering[job_id]
+                    timeouts = 0
+                    if verbose:
+                        print("{} : collecte achevée.".format(harvest_name))
+                elif monotonic() - launched > gather_timeout:
+                    del gathering[job_id]
+                    timeouts += 1
+                    if verbose:
+                        print("{} : collecte toujours en cours après {} s," \
+                            " lancement des moissonnages suivants.".format(
+                            harvest_name, gather_timeout))
+
+            if pending and max_gather_timeouts \
+                and timeouts >= max_gather_timeouts:
+                m = "{} phases de collecte consécutives inachevées après" \
+                    " {} s, abandon des {} moissonnage(s) restant(s), à" \
+                    " partir de {}.".format(timeouts, gather_timeout,
+                    len(pending), pending[0][0])
+                if verbose:
+                    print(m)
+                if strict:
+                    raise DialogError(m)
+                pending = []
+
+            # ------ lancements ------
+            while pending and (sleep_duration or len(gathering) < max_gathers):
+                harvest_name, harvest_id, url = pending[0]
+                host = urlparse(url).netloc if url else None
+                if not sleep_duration and host and len(
+                    [e for e in gathering.values() if e[1] == host]
+                ) >= max_gathers_per_host:
+                    # on respecte l'ordre de lancement
+                    break
+                del pending[0]
+
+                job, r, queued = self._launch_harvest_job(
+                    harvest_id=harvest_id, harvest_name=harvest_name)
+                if r is not None or job is None:
+                    r_error = r_error or r
                     m = "{} : échec du lancement de la tâche de" \
                         " moissonnage.".format(harvest_name)
                     if verbose:
                         print(m)
                     if strict:
                         raise DialogError(m)
-                    return r
-                else:
-                    print("{} : moissonnage relancé.".format(harvest_name))
+                    continue
 
-                    if sleep_duration:
+                if verbose:
+                    print("{} : {}.".format(harvest_name, "moissonnage relancé" \
+                        if queued else "tâche de moissonnage déjà en cours"))
+
+                if sleep_duration:
+                    if pending:
                         sleep(sleep_duration)
+                    continue
 
+                # pour une tâche déjà en cours, qui n'a pas été
+                # remise dans la queue, gather_started ne changera
+                # pas et ne peut servir de référence
+                gathering[job['id']] = (
+                    harvest_name, host,
+                    job.get('gather_started') if queued else None,
+                    monotonic()
+                )
+
+            if gathering:
+                sleep(poll_interval)
+
+        return r_error
 
     def run_harvest_job(self, harvest_id=None, harvest_name=None):
         """Relance un moissonnage.
@@ -833,7 +1367,43 @@ class CkanEnv:
         Il n'est ainsi jamais vérifié que `harvest_name` et `harvest_id` pointent
         bien sur le même moissonnage si les deux sont fournis, seul
         `harvest_id` est utilisé pour les requêtes.
+
+        La méthode crée une nouvelle tâche, qui est immédiatement
+        placée dans la queue. Si une tâche est déjà en attente pour
+        ce moissonnage, c'est elle qui est mise dans la queue. Si une
+        tâche est déjà en cours, elle n'est pas relancée.
+        Le coût de la relance ne dépend pas du nombre de tâches
+        exécutées par le passé.
         
+        """
+        job, r, queued = self._launch_harvest_job(harvest_id=harvest_id,
+            harvest_name=harvest_name)
+        return r
+
+    def _launch_harvest_job(self, harvest_id=None, harvest_name=None):
+        """Relance un moissonnage et renvoie la tâche correspondante.
+
+        Parameters
+        ---------
+        harvest_name : str, optional
+            L'identifiant (`name`) d'un moissonnage.
+        harvest_id : str
+            L'identifiant technique CKAN d'un moissonnage (`id`).
+
+        Returns
+        -------
+        tuple
+            Un tuple avec :
+
+            * ``[0]`` le dictionnaire décrivant la tâche lancée, tel
+              que renvoyé par l'API avant son lancement, ou None en
+              cas d'échec.
+            * ``[1]`` None si l'action a réussi, sinon la réponse de
+              requests (requests.Response) pour la requête en erreur.
+            * ``[2]`` True si la tâche a été mise dans la queue, False
+              s'il s'agit d'une tâche déjà en cours d'exécution, qui
+              n'a pas été relancée (ou en cas d'échec).
+
         """
         if not harvest_name and not harvest_id:
             raise ValueError("'harvest_id' ou 'harvest_name' doit être spécifié.")
@@ -841,27 +1411,40 @@ class CkanEnv:
         # il faut l'id du moissonnage, pas son nom
         harvest_id = harvest_id or self.harvest_id_from_name(harvest_name)
 
-        # récupération de la liste des tâches de moissonnage
-        r = self.action_request('harvest_job_list', { 'source_id': harvest_id })
-        if not action_success(r):
-            return r
-
-        l = [ j['id'] for j in r.json()['result']]
-
-        if l:
-            # on prend la première tâche de la liste et on la
-            # remet dans la queue
-            r = self.action_request(
-                'harvest_send_job_to_gather_queue', { 'id': l[0] })
+        # création d'une nouvelle tâche - elle sera
+        # automatiquement mise dans la queue
+        r_create = self.action_request('harvest_job_create',
+            { 'source_id': harvest_id })
+        if action_success(r_create):
+            return r_create.json()['result'], None, True
+
+        # la création échoue notamment quand une tâche est
+        # déjà en attente ou en cours pour le moissonnage. On
+        # ne recherche alors que celle-ci, et non toute
+        # l'historique des tâches du moissonnage.
+        for status in ('New', 'Running'):
+            r = self.action_request('harvest_job_list',
+                { 'source_id': harvest_id, 'status': status })
             if not action_success(r):
-                return r
-        else:
-            # s'il n'y a pas de tâche déjà définie, on en crée une
-            # (et elle sera automatiquement exécutée)
-            r = self.action_request('harvest_job_create',
-                { 'source_id': harvest_id })
+                return None, r, False
+            l = r.json()['result']
+            if not l:
+                continue
+            job = l[0]
+            if status == 'Running':
+                # déjà en cours d'exécution, il ne faut
+                # surtout pas la remettre dans la queue
+                return job, None, False
+            # la tâche en attente est mise dans la queue
+            # immédiatement, sans attendre la prochaine
+            # exécution du cron
+            r = self.action_request(
+                'harvest_send_job_to_gather_queue', { 'id': job['id'] })
             if not action_success(r):
-                return r
+                return None, r, False
+            return job, None, True
+
+        return None, r_create, False
 
 
     def harvest_id_from_name(self, harvest_name):
@@ -1207,6 +1790,189 @@ class CkanEnv:
         return n, e, r_e
 
 
+    def watch_harvests(self, active_interval=5, idle_interval=300,
+        duration=None):
+        """Suit en continu l'état des moissonnages de l'instance.
+
+        Les tâches en cours sont suivies à haute fréquence, par une
+        unique requête ``harvest_job_list`` filtrée sur le statut
+        ``Running``. Les moissonnages inactifs sont interrogés à tour
+        de rôle (``harvest_source_show_status``), de sorte que chacun
+        le soit environ une fois par `idle_interval`, ce qui permet de
+        détecter les tâches trop brèves pour avoir été vues en cours.
+
+        Parameters
+        ----------
+        active_interval : float, default 5
+            Intervalle entre deux interrogations de l'API sur les
+            tâches en cours, en secondes.
+        idle_interval : float, default 300
+            Intervalle approximatif entre deux interrogations de l'API
+            pour un même moissonnage inactif, en secondes. C'est aussi
+            l'intervalle de mise à jour de la liste des moissonnages de
+            l'instance.
+        duration : float, optional
+            Durée du suivi, en secondes. Si non spécifiée, le suivi
+            se poursuit indéfiniment.
+
+        Yields
+        ------
+        dict
+            Un évènement, tel que décrit par :py:func:`harvest_event`.
+            ``'started'`` quand une tâche démarre, ``'finished'``
+            quand elle s'achève sans erreur, ``'errored'`` quand
+            elle s'achève avec des erreurs.
+
+        Raises
+        ------
+        DialogError
+            Si la liste des moissonnages de l'instance ne peut
+            être obtenue.
+
+        Notes
+        -----
+        Lors du premier passage sur un moissonnage inactif, sa dernière
+        tâche est seulement mémorisée, sans émission d'évènement. Les
+        tâches déjà en cours au lancement du suivi donnent lieu à un
+        évènement ``'started'``.
+
+        Examples
+        --------
+        >>> for event in ckan.dev.watch_harvests():
+        ...     print(event['event'], event['harvest_name'])
+
+        """
+        sources = self.harvest_sources_list('both')
+        names = {v: k for k, v in sources.items()}
+        idle_queue = deque(sources.values())
+        # tâches en cours, par identifiant de tâche
+        running = {}
+        # identifiant de la dernière tâche achevée connue
+        # pour chaque moissonnage
+        last_jobs = {}
+
+        start = monotonic()
+        last_refresh = start
+
+        while duration is None or monotonic() - start < duration:
+            cycle = monotonic()
+
+            # ------ tâches en cours ------
+            r = self.action_request('harvest_job_list', {'status': 'Running'})
+            if action_success(r):
+                current = {j['id']: j for j in r.json()['result']}
+                for job_id, job in current.items():
+                    if not job_id in running:
+                        yield harvest_event('started', job,
+                            names.get(job.get('source_id')))
+                for job_id in set(running) - set(current):
+                    r = self.action_request('harvest_job_show', {'id': job_id})
+                    job = r.json()['result'] if action_success(r) \
+                        else running[job_id]
+                    yield harvest_event(
+                        'errored' if (job.get('stats') or {}).get('errored') \
+                            else 'finished',
+                        job,
+                        names.get(job.get('source_id'))
+                    )
+                    last_jobs[job.get('source_id')] = job_id
+                running = current
+
+            # ------ moissonnages inactifs, à tour de rôle ------
+            busy = {j.get('source_id') for j in running.values()}
+            share = ceil(len(idle_queue) * active_interval / idle_interval)
+            for k in range(min(share, len(idle_queue))):
+                harvest_id = idle_queue[0]
+                idle_queue.rotate(-1)
+                if harvest_id in busy:
+                    continue
+                r = self.action_request('harvest_source_show_status',
+                    { 'id': harvest_id })
+                if not action_success(r):
+                    continue
+                job = r.json()['result'].get('last_job')
+                if not job or not job.get('finished'):
+                    continue
+                if harvest_id in last_jobs and \
+                    last_jobs[harvest_id] != job.get('id'):
+                    job['source_id'] = job.get('source_id') or harvest_id
+                    yield harvest_event(
+                        'errored' if (job.get('stats') or {}).get('errored') \
+                            else 'finished',
+                        job,
+                        names.get(harvest_id)
+                    )
+                last_jobs[harvest_id] = job.get('id')
+
+            # ------ mise à jour de la liste des moissonnages ------
+            if monotonic() - last_refresh > idle_interval:
+                last_refresh = monotonic()
+                try:
+                    sources = self.harvest_sources_list('both')
+                except DialogError:
+                    pass
+                else:
+                    names = {v: k for k, v in sources.items()}
+                    idle_queue = deque(
+                        [e for e in idle_queue if e in names] +
+                        [e for e in names if not e in idle_queue]
+                    )
+
+            sleep(max(0, active_interval - (monotonic() - cycle)))
+
+    def harvest_history(self, harvest_sources=None):
+        """Renvoie les durées et volumes des dernières exécutions des moissonnages.
+
+        Parameters
+        ----------
+        harvest_sources : dict, optional
+            Dictionnaire des moissonnages à considérer, avec leurs
+            identifiants (`name`) pour clés et leurs identifiants
+            techniques CKAN (`id`) pour valeurs. Si non spécifié,
+            tous les moissonnages de l'instance sont considérés.
+
+        Returns
+        -------
+        dict
+            Un dictionnaire dont les clés sont les identifiants
+            (`name`) des moissonnages et les valeurs des dictionnaires
+            avec :
+
+            * ``'duration'`` la durée de la dernière tâche achevée,
+              de la phase *gather* à la fin de la phase *fetch*, en
+              secondes (float), ou None si elle n'est pas connue.
+            * ``'datasets'`` le nombre de jeux de données moissonnés
+              (int), ou None s'il n'est pas connu.
+
+        Notes
+        -----
+        Les moissonnages pour lesquels ``harvest_source_show_status``
+        échoue ont une durée et un volume inconnus.
+
+        """
+        if harvest_sources is None:
+            harvest_sources = self.harvest_sources_list('both')
+
+        history = {}
+        for harvest_name, harvest_id in harvest_sources.items():
+            history[harvest_name] = {'duration': None, 'datasets': None}
+            r = self.action_request('harvest_source_show_status',
+                { 'id': harvest_id })
+            if not action_success(r):
+                continue
+            e = r.json()['result']
+            history[harvest_name]['datasets'] = e.get('total_datasets')
+            last_job = e.get('last_job') or {}
+            if last_job.get('gather_started') and last_job.get('finished'):
+                try:
+                    history[harvest_name]['duration'] = (
+                        datetime.fromisoformat(last_job['finished'])
+                        - datetime.fromisoformat(last_job['gather_started'])
+                    ).total_seconds()
+                except ValueError:
+                    pass
+        return history
+
     def harvest_summary(self, export=False):
         """Construit une table récapitulative des moissonnages.
 
@@ -1332,6 +2098,37 @@ class Summary(list):
             dest.write(txt)
 
 
+def failed_response(url, err):
+    """Construit une réponse en erreur pour une requête qui n'a pas abouti.
+
+    Parameters
+    ----------
+    url : str
+        L'URL de la requête.
+    err : requests.RequestException
+        L'erreur rencontrée.
+
+    Returns
+    -------
+    requests.Response
+        Une réponse sans code de statut (``status_code`` vaut
+        None), dont l'attribut ``reason`` décrit l'erreur
+        et dont le contenu JSON est celui d'une action en
+        échec de l'API de CKAN.
+
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = None
+    response.reason = '{}: {}'.format(type(err).__name__, err)
+    response.request = err.request
+    response._content = json.dumps({
+        'success': False,
+        'error': {'__type': 'Network Error', 'message': response.reason}
+        }).encode('utf-8')
+    return response
+
+
 def action_success(action_result):
     """Détermine le statut d'une requête passée à l'API.
 
@@ -1354,6 +2151,210 @@ def action_success(action_result):
         return False
 
 
+def harvest_job_phase(job, baseline=None):
+    """Détermine la phase d'exécution d'une tâche de moissonnage.
+
+    Parameters
+    ----------
+    job : dict
+        La tâche de moissonnage, telle que renvoyée par
+        ``harvest_job_show`` ou ``harvest_job_list``.
+    baseline : str, optional
+        Pour une tâche pré-existante remise dans la queue, la
+        valeur de son champ ``gather_started`` avant sa relance.
+        Tant que celle-ci n'a pas changé, la tâche est considérée
+        comme en attente.
+
+    Returns
+    -------
+    {'queued', 'gather', 'fetch', 'finished'}
+
+    """
+    if job.get('status') == 'Finished':
+        return 'finished'
+    gather_started = job.get('gather_started')
+    if not gather_started or gather_started == baseline:
+        return 'queued'
+    gather_finished = job.get('gather_finished')
+    if not gather_finished or gather_finished < gather_started:
+        # les dates sont au format ISO, la comparaison
+        # des chaînes de caractères suffit
+        return 'gather'
+    return 'fetch'
+
+
+def harvest_event(event, job, harvest_name=None):
+    """Construit un évènement de suivi des moissonnages.
+
+    Parameters
+    ----------
+    event : {'started', 'finished', 'errored'}
+        La nature de l'évènement.
+    job : dict
+        La tâche de moissonnage concernée, telle que renvoyée
+        par l'API.
+    harvest_name : str, optional
+        L'identifiant (`name`) du moissonnage.
+
+    Returns
+    -------
+    dict
+        Un dictionnaire avec pour clés ``'event'``, ``'harvest_name'``,
+        ``'harvest_id'``, ``'job_id'``, ``'status'``, ``'stats'``
+        (statistiques de la tâche, None si non disponibles) et ``'time'``
+        (date de l'évènement d'après l'API, ou à défaut date de
+        sa détection).
+
+    """
+    time = job.get('finished') if event != 'started' \
+        else job.get('gather_started') or job.get('created')
+    return {
+        'event': event,
+        'harvest_name': harvest_name,
+        'harvest_id': job.get('source_id'),
+        'job_id': job.get('id'),
+        'status': job.get('status'),
+        'stats': job.get('stats'),
+        'time': time or strftime("%Y-%m-%dT%H:%M:%S", localtime())
+    }
+
+
+def order_harvests(harvest_names, harvest_collection, history=None,
+    ordered_urls=None):
+    """Ordonne des moissonnages pour réduire la durée totale de leur exécution.
+
+    Les moissonnages dont la durée estimée est la plus longue sont
+    placés en premier, afin que leurs phases *fetch* se superposent
+    au mieux aux autres moissonnages. L'ordre relatif initial est
+    néanmoins préservé :
+
+    * pour les moissonnages d'une même organisation sur un même
+      serveur (moissonnages différenciés selon ``restrictions``) ;
+    * pour les moissonnages d'une même organisation sur des
+      serveurs listés dans `ordered_urls`, dont les catalogues se
+      recouvrent.
+
+    Parameters
+    ----------
+    harvest_names : list(str)
+        Les identifiants (`name`) des moissonnages, dans l'ordre
+        de lancement de référence.
+    harvest_collection : dict
+        Le répertoire des moissonnages.
+    history : dict, optional
+        Historique des moissonnages, tel que renvoyé par
+        :py:meth:`CkanEnv.harvest_history`.
+    ordered_urls : list(str), optional
+        Liste des URL des serveurs dont l'ordre de moissonnage
+        importe, tel que défini par ``serveurs_csw_ordre.json``.
+
+    Returns
+    -------
+    list(str)
+        Les identifiants des moissonnages, dans l'ordre de lancement.
+
+    Notes
+    -----
+    La durée d'un moissonnage est celle de sa dernière exécution
+    si elle est connue. À défaut, elle est déduite du nombre de
+    jeux de données moissonnés - ou, s'il n'est pas connu, du nombre
+    de fiches mentionné dans le champ ``notes`` du répertoire - et de
+    la durée moyenne de moissonnage d'un jeu de données.
+
+    """
+    history = history or {}
+    ordered_urls = ordered_urls or []
+
+    # ------ estimation des durées ------
+    volumes = {}
+    for harvest_name in harvest_names:
+        n = (history.get(harvest_name) or {}).get('datasets')
+        if n is None:
+            r = re.search(
+                r'^(?:.*[^0-9])?([0-9]+)\sfiche',
+                harvest_collection[harvest_name].get('notes') or ''
+            )
+            n = int(r[1]) if r else None
+        volumes[harvest_name] = n
+
+    known = [
+        (history[h]['duration'], volumes[h]) for h in harvest_names
+        if (history.get(h) or {}).get('duration') is not None and volumes[h]
+    ]
+    rate = sum(e[0] for e in known) / sum(e[1] for e in known) \
+        if known else 1
+
+    def estimate(harvest_name):
+        duration = (history.get(harvest_name) or {}).get('duration')
+        if duration is not None:
+            return duration
+        return (volumes[harvest_name] or 0) * rate
+
+    # ------ contraintes d'ordre ------
+    # chaque moissonnage a au plus un prédécesseur, le moissonnage
+    # qui le précède dans la même chaîne
+    successor = {}
+    has_predecessor = set()
+    last_of_chain = {}
+    for harvest_name in harvest_names:
+        harvest = harvest_collection[harvest_name]
+        url = harvest.get('url')
+        chain = (harvest.get('owner_org'),
+            None if url in ordered_urls else url)
+        if chain in last_of_chain:
+            successor[last_of_chain[chain]] = harvest_name
+            has_predecessor.add(harvest_name)
+        last_of_chain[chain] = harvest_name
+
+    # ------ ordonnancement ------
+    rank = {h: i for i, h in enumerate(harvest_names)}
+    available = [
+        (- estimate(h), rank[h], h) for h in harvest_names
+        if not h in has_predecessor
+    ]
+    heapq.heapify(available)
+    res = []
+    while available:
+        _, _, harvest_name = heapq.heappop(available)
+        res.append(harvest_name)
+        if harvest_name in successor:
+            h = successor[harvest_name]
+            heapq.heappush(available, (- estimate(h), rank[h], h))
+    return res
+
+
+_insecure_hosts = set()
+_insecure_hosts_lock = threading.Lock()
+
+def ignore_insecure_warnings(url):
+    """Inhibe les avertissements sur la non-vérification des certificats pour un hôte.
+
+    Le filtre est installé une fois pour toutes et ne concerne
+    que l'hôte considéré, contrairement à un contexte
+    :py:class:`warnings.catch_warnings` autour de chaque requête,
+    qui modifie l'état global du module :py:mod:`warnings` et
+    n'est pas sûr lorsque plusieurs fils d'exécution envoient
+    des requêtes.
+
+    Parameters
+    ----------
+    url : str
+        Une URL de l'hôte.
+
+    """
+    host = urlparse(url).hostname
+    if not host:
+        return
+    with _insecure_hosts_lock:
+        if host in _insecure_hosts:
+            return
+        warnings.filterwarnings(
+            'ignore',
+            message=f".*host '{re.escape(host)}'",
+            category=InsecureRequestWarning
+        )
+        _insecure_hosts.add(host)
+
 def json_import(filename):
     """Importe un fichier JSON du répertoire parent du module.
 
@@ -1394,4 +2395,19 @@ def r_print(response):
 class DialogError(Exception):
     """Quand l'API CKAN renvoie une erreur.
 
+    Parameters
+    ----------
+    message : str, optional
+        Description de l'erreur.
+    response : requests.Response, optional
+        S'il y a lieu, la réponse de l'API porteuse de l'erreur.
+
+    Attributes
+    ----------
+    response : requests.Response or None
+        S'il y a lieu, la réponse de l'API porteuse de l'erreur.
+
     """
+    def __init__(self, message=None, response=None):
+        super().__init__(message)
+        self.response = response
@@ -1,14 +1,16 @@
 """Gestion des moissonnages."""
 
-import json, requests
+import json, requests, threading
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
 from pathlib import Path
 
 from maintenance import __path__ as maintenance_path
-from maintenance.config import (
-    REQUESTS_CONFIG
-)
+from maintenance.config import UserConfig
+from maintenance.registry import Registry
+from maintenance.shards import dump_shards, load_shards
 
-class Harvest:
+class Harvest(Registry):
     """Une configuration de moissonnage.
     
     Attributes
@@ -39,46 +41,174 @@ class Harvest:
     Pour les fréquences : 
     https://github.com/ckan/ckanext-harvest/blob/master/ckanext/harvest/model/__init__.py
 
+    Notes
+    -----
+    Le répertoire :py:attr:`Harvest.COLLECTION` peut être lu
+    par plusieurs fils d'exécution pendant qu'il est modifié,
+    cf. :py:mod:`maintenance.registry`. Un moissonnage n'y est
+    inscrit qu'une fois entièrement initialisé.
+
     """
 
     COLLECTION = {}
 
+    ATTRIBUTES = ('url', 'name', 'owner_org', 'source_type', 'title',
+        'notes', 'frequency')
+    """Propriétés stockées comme attributs. Les autres relèvent de la configuration."""
+
+    _INDEXED = ('owner_org', 'url', 'source_type')
+    """Attributs pour lesquels le répertoire est indexé."""
+
+    _INDEXES = {attr: {} for attr in _INDEXED}
+    """Index du répertoire.
+
+    Pour chaque attribut indexé, dictionnaire dont les clés sont
+    les valeurs de l'attribut et les valeurs des ensembles
+    d'identifiants de moissonnages.
+
+    """
+
+    _LOCK = threading.RLock()
+    """Verrou des écritures sur le répertoire."""
+
+    _STAGING = None
+    """Copie de travail du répertoire et des index pendant un chargement."""
+
+    _NEXT_INDEX = {}
+    """Plus petit numéro d'ordre potentiellement libre, par organisation."""
+
+    _SOURCES = {}
+    """Sources déjà chargées.
+
+    Les clés sont les chemins absolus des fichiers ou les URL,
+    les valeurs des dictionnaires avec les clés ``'mtime'``,
+    ``'size'`` et ``'hash'`` (fichiers) ou ``'etag'`` et
+    ``'last_modified'`` (URL), ainsi que ``'names'``, la liste des
+    identifiants des moissonnages définis par la source.
+
+    """
+
+    SHARDS = Path(maintenance_path[0]).parent / 'shards' / 'harvests'
+    """Répertoire par défaut de l'export fragmenté des moissonnages."""
+
     def __init__(
         self, url, owner_org, source_type, title=None,
         name=None, notes=None, frequency='WEEKLY', **kwargs
     ):
-        self.url = url
-        self.owner_org = owner_org
-        self.source_type = source_type
-        self.notes = notes
-        self.frequency = frequency
-        if not name:
-            i = 1
-            while True:
-                i_name = str(i).rjust(2, '0')
-                beta_name = f'{owner_org}-h{i_name}'
-                if not beta_name in Harvest.COLLECTION:
-                    self.name = beta_name
-                    break
-                i += 1
-        else:
-            self.name = name
-        self.config = {}
-        for property, value in kwargs.items():
-            if property == 'config':
-                if isinstance(value, str):
-                    config = json.loads(value)
-                else:
-                    config = value
-                for conf_key, conf_value in config:
-                    self.set(conf_key, conf_value)
-            else:
+        with Harvest._LOCK:
+            # le verrou garantit que l'identifiant alloué
+            # est encore libre au moment de l'inscription
+            self.name = name or Harvest.new_name(owner_org)
+            self.url = url
+            self.owner_org = owner_org
+            self.source_type = source_type
+            self.title = title
+            self.notes = notes
+            self.frequency = frequency
+            self.config = {}
+            for property, value in kwargs.items():
                 self.set(property, value)
+            previous = Harvest._registry()[0].get(self.name)
+            if previous:
+                previous._unindex()
+            Harvest._register(self.name, self)
+            for attr in Harvest._INDEXED:
+                self._index(attr)
     
     def __repr__(self):
         title = self.title or '?'
         return f'Harvest < {self.name} | {title} >'
 
+    def __setattr__(self, attr, value):
+        if attr in Harvest._INDEXED:
+            self._index(attr, add=False)
+            object.__setattr__(self, attr, value)
+            self._index(attr)
+        else:
+            object.__setattr__(self, attr, value)
+
+    def _index(self, attr, add=True):
+        """Met à jour l'index du répertoire pour un attribut du moissonnage.
+
+        Seul le moissonnage effectivement répertorié sous
+        son identifiant est indexé.
+
+        Parameters
+        ----------
+        attr : {'owner_org', 'url', 'source_type'}
+            L'attribut.
+        add : bool, default True
+            Si ``True``, le moissonnage est ajouté à l'index
+            selon la valeur courante de l'attribut, sinon il
+            en est retiré.
+
+        """
+        self._update_index(attr, [getattr(self, attr, None)], add=add)
+
+    def _unindex(self):
+        """Retire le moissonnage de tous les index du répertoire."""
+        for attr in Harvest._INDEXED:
+            self._index(attr, add=False)
+
+    @classmethod
+    def new_name(cls, owner_org):
+        """Renvoie un identifiant libre pour un moissonnage de l'organisation.
+
+        L'identifiant est de la forme ``<owner_org>-hNN``, où
+        ``NN`` est le plus petit numéro d'ordre libre.
+
+        Parameters
+        ----------
+        owner_org : str
+            L'identifiant de l'organisation.
+
+        Returns
+        -------
+        str
+
+        """
+        with cls._LOCK:
+            collection = cls._registry()[0]
+            i = cls._NEXT_INDEX.get(owner_org, 1)
+            while f'{owner_org}-h{i:02}' in collection:
+                i += 1
+            # les numéros inférieurs sont tous pris, et ne peuvent être
+            # libérés que par clear, qui réinitialise les compteurs
+            cls._NEXT_INDEX[owner_org] = i
+            return f'{owner_org}-h{i:02}'
+
+    def set(self, property, value):
+        """Définit la valeur d'une propriété du moissonnage.
+
+        Parameters
+        ----------
+        property : str
+            L'identifiant de la propriété. S'il ne s'agit pas
+            d'un des attributs listés par :py:data:`Harvest.ATTRIBUTES`,
+            c'est un paramètre de configuration du moissonnage.
+            ``'config'`` remplace l'ensemble de la configuration.
+        value : str or dict or list
+            La valeur de la propriété. Pour ``'config'``, un
+            dictionnaire ou sa sérialisation JSON. Si la valeur
+            d'un paramètre de configuration est None, le paramètre
+            est supprimé.
+
+        """
+        if property == 'name':
+            raise ValueError("l'identifiant d'un moissonnage ne peut être modifié")
+        if property in Harvest.ATTRIBUTES:
+            setattr(self, property, value)
+        elif property == 'config':
+            if isinstance(value, str):
+                value = json.loads(value)
+            self.config = {}
+            for conf_key, conf_value in (value or {}).items():
+                self.set(conf_key, conf_value)
+        elif value is None:
+            self.config.pop(property, None)
+        else:
+            self.config[property] = value
+
     @classmethod
     def search(cls, name):
         """Renvoie le moissonnage d'identifiant considéré, si répertorié.
@@ -105,11 +235,47 @@ class Harvest:
         Yields
         ------
         Harvest
+            Les moissonnages, par ordre alphabétique
+            d'identifiant.
 
         """
-        for harvest in cls.COLLECTION.values():
-            if harvest.owner_org == owner_org:
-                yield harvest
+        yield from cls._lookup('owner_org', owner_org)
+
+    @classmethod
+    def by_url(cls, url):
+        """Renvoie les moissonnages d'un catalogue.
+
+        Parameters
+        ----------
+        url : str
+            L'URL du catalogue.
+
+        Returns
+        -------
+        list(Harvest)
+            Les moissonnages, par ordre alphabétique
+            d'identifiant.
+
+        """
+        return cls._lookup('url', url)
+
+    @classmethod
+    def by_source_type(cls, source_type):
+        """Renvoie les moissonnages d'un type donné.
+
+        Parameters
+        ----------
+        source_type : {'dcat', 'csw', 'ckan'}
+            Nature du moissonnage.
+
+        Returns
+        -------
+        list(Harvest)
+            Les moissonnages, par ordre alphabétique
+            d'identifiant.
+
+        """
+        return cls._lookup('source_type', source_type)
     
     @classmethod
     def update(cls, name, property, value):
@@ -147,32 +313,68 @@ class Harvest:
             considérés sont supprimés.
 
         """
-        if not source_type:
-            cls.COLLECTION.clear()
-        else:
-            copy_collection = cls.COLLECTION.copy()
-            for harvest_name, harvest in copy_collection.items():
-                if harvest.source_type == source_type:
-                    del cls.COLLECTION[harvest_name]
+        with cls._staging():
+            cls._NEXT_INDEX.clear()
+            cls._SOURCES.clear()
+            if not source_type:
+                cls._reset()
+                return
+            collection, indexes = cls._registry()
+            for name in list(indexes['source_type'].get(source_type, ())):
+                collection[name]._unindex()
+                cls._register(name, None)
 
     @classmethod
-    def dump(cls, directory=None, source_type=None):
+    def dump(cls, directory=None, source_type=None, sharded=False, prune=False):
         """Exporte le répertoire des moissonnages.
 
         Si `directory` n'est pas fourni, la méthode remplace
         les fichiers du répertoire ``harvests``, qu'elle crée
         si besoin. Il y a un fichier par type de source.
 
+        Avec ``sharded=True``, le répertoire est exporté sous
+        forme fragmentée, avec un fichier par moissonnage, cf.
+        :py:func:`maintenance.shards.dump_shards`. Seuls les
+        fichiers des moissonnages modifiés sont réécrits.
+
         Parameters
         ----------
         directory : pathlib.Path or str, optional
             Chemin du répertoire d'export. Il sera créé
-            s'il n'existe pas.
+            s'il n'existe pas. Pour un export fragmenté, le
+            répertoire par défaut est ``shards/harvests`` à la
+            racine du dépôt.
         source_type : str, optionnal
             Si fourni, seuls les moissonnages du type
             considéré sont exportés.
+        sharded : bool, default False
+            Si ``True``, export fragmenté.
+        prune : bool, default False
+            Pour un export fragmenté, si ``True``, les fichiers des
+            moissonnages qui ne sont plus répertoriés sont
+            supprimés. À éviter lorsque le répertoire n'a été
+            que partiellement chargé, et ignoré si `source_type`
+            est renseigné.
+
+        Returns
+        -------
+        list(str) or None
+            Pour un export fragmenté, la liste des identifiants
+            des moissonnages dont le fichier a été modifié.
 
         """
+        if sharded:
+            return dump_shards(
+                {
+                    harvest.name: harvest.dict
+                    for harvest in cls.COLLECTION.values()
+                    if not source_type or harvest.source_type == source_type
+                },
+                directory or Harvest.SHARDS,
+                index=('owner_org', 'source_type', 'url'),
+                prune=prune and not source_type
+            )
+
         if directory:
             dir_path = Path(directory)
             if not dir_path.exists() or not dir_path.is_dir():
@@ -193,14 +395,18 @@ class Harvest:
         for src in src_collection:
             file_path = dir_path / f'{src}.json'
             data = json.dumps(
-                {harvest.name: harvest.dict for harvest in src_collection},
+                {harvest.name: harvest.dict for harvest in src_collection[src]},
                 ensure_ascii=False,
                 indent=4
             )
             file_path.write_text(data,encoding='utf-8')
 
     @classmethod
-    def load(cls, directory=None, file=None, url=None, append=True, **kwargs):
+    def load(
+        cls, directory=None, file=None, url=None, append=True,
+        sharded=False, owner_org=None, source_type=None, force=False,
+        max_workers=4, **kwargs
+    ):
         """Charge les moissonnages depuis une source externe.
 
         Les sources doivent être des JSON de structure identique
@@ -212,6 +418,20 @@ class Harvest:
         méthode tente de charger les organisations depuis les fichiers
         du répertoire `harvests`.
 
+        Le chargement est incrémental : une source déjà chargée
+        n'est relue que si elle a changé depuis (date de modification,
+        taille puis empreinte pour un fichier, requête conditionnelle
+        sur l'``ETag`` ou la date de dernière modification pour une
+        URL). Les moissonnages qu'une source modifiée ne définit plus,
+        de même que ceux des fichiers supprimés du répertoire, sont
+        retirés du répertoire. Les fichiers modifiés d'un même
+        répertoire sont lus en parallèle.
+
+        Le répertoire n'est substitué qu'une fois toutes les sources
+        chargées. Les fils d'exécution qui le lisent pendant ce
+        temps voient l'ancien répertoire, jamais un état
+        intermédiaire, et il reste inchangé en cas d'erreur.
+
         Parameters
         ----------
         directory : pathlib.Path or str, optional
@@ -228,7 +448,27 @@ class Harvest:
             le répertoire est vidé avant d'être reconstitué
             à partir de la source. Dans les deux cas les moissonnages
             communs au répertoire courant et à la source sont remplacés
-            selon la source.
+            selon la source. Avec ``append=False``, toutes les
+            sources sont relues.
+        sharded : bool, default False
+            Si ``True``, les moissonnages sont chargés depuis un
+            répertoire fragmenté, cf. :py:meth:`Harvest.dump`.
+            `directory` est alors le chemin de ce répertoire,
+            par défaut ``shards/harvests`` à la racine du dépôt.
+        owner_org : str or list(str), optional
+            Pour un chargement depuis un répertoire fragmenté,
+            ne charge que les moissonnages de la ou des
+            organisations considérées. Les autres fichiers ne
+            sont pas lus.
+        source_type : str or list(str), optional
+            Pour un chargement depuis un répertoire fragmenté,
+            ne charge que les moissonnages du ou des types
+            considérés.
+        force : bool, default False
+            Si ``True``, les sources sont relues même si elles
+            n'ont pas changé.
+        max_workers : int, default 4
+            Nombre maximal de fichiers lus simultanément.
         **kwargs
             Paramètres additionnels à passer à la fonction
             :py:func:``open`` si la source est un fichier,
@@ -236,18 +476,51 @@ class Harvest:
             s'agit d'une ressource web.
 
         """
+        force = force or not append
+
         if url:
-            params = REQUESTS_CONFIG.copy()
+            source = cls._SOURCES.get(url)
+            params = dict(UserConfig.requests_config())
             params.update(kwargs)
-            response = requests.get(url)
+            headers = params.pop('headers', None) or {}
+            if source and not force:
+                if source.get('etag'):
+                    headers['If-None-Match'] = source['etag']
+                if source.get('last_modified'):
+                    headers['If-Modified-Since'] = source['last_modified']
+            response = requests.get(url, headers=headers, **params)
+            if response.status_code == 304:
+                return
             response.raise_for_status()
             data = response.json()
-        elif file:
+            with cls._staging():
+                if not append:
+                    cls.clear()
+                cls._load_source(url, data, {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified')
+                })
+            return
+
+        if sharded:
+            data = load_shards(
+                directory or Harvest.SHARDS,
+                owner_org=owner_org,
+                source_type=source_type
+            )
+            with cls._staging():
+                if not append:
+                    cls.clear()
+                for name in data:
+                    Harvest(**data[name])
+            return
+
+        dir_path = None
+        if file:
             file_path = Path(file)
             if not file_path.exists() or not file_path.is_file():
                 raise FileNotFoundError(f'file "{file}" not found')
-            raw = file_path.read_text(encoding='utf-8')
-            data = json.loads(raw)
+            files = [file_path.resolve()]
         else:
             if directory:
                 dir_path = Path(directory)
@@ -257,18 +530,79 @@ class Harvest:
                 dir_path = Path(maintenance_path[0]).parent / 'harvests'
                 if not dir_path.exists() or not dir_path.is_dir():
                     return
-            data = {}
-            for harvest_file in dir_path.iterdir():
-                if harvest_file.is_file() and harvest_file.suffix == '.json':
-                    raw = file_path.read_text(encoding='utf-8')
-                    file_data = json.loads(raw)
-                    if isinstance(file_data, dict):
-                        data.update(file_data)
-                        print(f'retrieved harvest configurations from "{file_data}"')
-        if not append:
-            cls.clear()
-        for org in data:
-            Harvest(**data[org])
+            dir_path = dir_path.resolve()
+            files = sorted(
+                harvest_file for harvest_file in dir_path.iterdir()
+                if harvest_file.is_file() and harvest_file.suffix == '.json'
+            )
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                lambda harvest_file: _read_harvest_file(
+                    harvest_file, None if force \
+                        else cls._SOURCES.get(str(harvest_file))
+                ),
+                files
+            ))
+
+        with cls._staging():
+            if not append:
+                cls.clear()
+            if dir_path:
+                # fichiers supprimés depuis le précédent chargement
+                for source in list(cls._SOURCES):
+                    if Path(source).parent == dir_path \
+                        and not Path(source) in files:
+                        cls._load_source(source, {}, None)
+            for harvest_file, (file_data, stamp) in zip(files, results):
+                if stamp is None:
+                    continue
+                if file_data is None:
+                    # contenu inchangé, seule la date de modification diffère
+                    cls._SOURCES[str(harvest_file)].update(stamp)
+                    continue
+                if not isinstance(file_data, dict):
+                    continue
+                cls._load_source(str(harvest_file), file_data, stamp)
+                if not file:
+                    print(f'retrieved harvest configurations from "{harvest_file}"')
+
+    @classmethod
+    def _load_source(cls, source, data, stamp):
+        """Intègre au répertoire les moissonnages définis par une source.
+
+        À appeler dans le contexte :py:meth:`Registry._staging`.
+
+        Parameters
+        ----------
+        source : str
+            Le chemin absolu du fichier ou l'URL.
+        data : dict
+            Les moissonnages définis par la source.
+        stamp : dict or None
+            Les informations permettant de détecter une future
+            modification de la source, cf. :py:data:`Harvest._SOURCES`.
+            None si la source a disparu.
+
+        """
+        previous = cls._SOURCES.pop(source, None)
+        if previous:
+            claimed = {
+                name for other in cls._SOURCES.values()
+                for name in other['names']
+            }
+            collection = cls._registry()[0]
+            for name in previous['names']:
+                if not name in data and not name in claimed \
+                    and name in collection:
+                    collection[name]._unindex()
+                    cls._register(name, None)
+                    cls._NEXT_INDEX.clear()
+        for name in data:
+            Harvest(**data[name])
+        if stamp is not None:
+            stamp['names'] = list(data)
+            cls._SOURCES[source] = stamp
 
     @property
     def dict(self):
@@ -290,3 +624,39 @@ class Harvest:
         if self.config:
             d['config'] = json.dumps(self.config, ensure_ascii=False)
         return d
+
+
+def _read_harvest_file(harvest_file, source=None):
+    """Lit un fichier de moissonnages s'il a changé.
+
+    Parameters
+    ----------
+    harvest_file : pathlib.Path
+        Chemin du fichier.
+    source : dict, optional
+        Les informations mémorisées lors du précédent chargement
+        du fichier, cf. :py:data:`Harvest._SOURCES`.
+
+    Returns
+    -------
+    tuple
+        Un tuple dont le premier élément est le contenu désérialisé
+        du fichier, ou None s'il n'a pas changé, et le second les
+        nouvelles informations de suivi du fichier, ou None si
+        ni son contenu ni sa date de modification n'ont changé.
+
+    """
+    stat = harvest_file.stat()
+    if source and source['mtime'] == stat.st_mtime \
+        and source['size'] == stat.st_size:
+        return None, None
+    raw = harvest_file.read_bytes()
+    stamp = {
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'hash': sha1(raw).hexdigest()
+    }
+    if source and source['hash'] == stamp['hash']:
+        return None, stamp
+    return json.loads(raw.decode('utf-8')), stamp
+
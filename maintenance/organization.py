@@ -10,20 +10,30 @@ Sauvegarde du répertoire dans ce même fichier après mise à jour :
     >>> Organization.dump()
 
 Le fichier est validé au moment de la sauvegarde, ce qui explique
-qu'elle ne soit pas immédiate (et puisse échouer si les données sont
-invalides).
+qu'elle puisse échouer si les données sont invalides. Cette validation
+ne fait appel à aucune ressource distante. Le contrôle de la
+disponibilité des logos est une étape distincte :
+
+    >>> Organization.check_logos()
+
+Une fois celui-ci réalisé, les organisations dont le logo est
+inaccessible sont considérées comme invalides.
 
 """
 
-import json, requests
+import copy, json, requests, sys, threading, time, zlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import MappingProxyType
 
 from maintenance import __path__ as maintenance_path
 from maintenance.config import (
-    LOGO_BASE, DEFAULT_LOGO, REQUESTS_CONFIG
+    LOGO_BASE, DEFAULT_LOGO, LOGO_CACHE_MAX_AGE, LOGO_TIMEOUT, UserConfig
 )
+from maintenance.registry import Registry
+from maintenance.shards import dump_shards, load_shards
 
-class Organization:
+class Organization(Registry):
     """Une organisation.
     
     Parameters
@@ -78,6 +88,13 @@ class Organization:
     extras : dict
         Métadonnées optionnelles.
 
+    Notes
+    -----
+    Le répertoire :py:attr:`Organization.COLLECTION` peut être
+    lu par plusieurs fils d'exécution pendant qu'il est modifié,
+    cf. :py:mod:`maintenance.registry`. Une organisation n'y est
+    inscrite qu'une fois entièrement initialisée.
+
     """
 
     PROPERTY_LABELS = {
@@ -108,13 +125,68 @@ class Organization:
 
     COLLECTION = {}
 
+    SHARDS = Path(maintenance_path[0]).parent / 'shards' / 'organizations'
+    """Répertoire par défaut de l'export fragmenté des organisations."""
+
+    __slots__ = ('name', 'title', 'label', '_description', 'image_url',
+        '_groups', '_extras', '_valid', '_logo_status')
+
+    DESCRIPTION_COMPRESS_MIN = 256
+    """Longueur à partir de laquelle les descriptifs sont conservés compressés en mémoire.
+
+    Les descriptifs ne sont pas chargés de manière différée : le
+    fichier ``organizations.json`` est un document JSON unique, qui
+    doit être entièrement analysé. Ils sont compressés à l'initialisation
+    des organisations, ce qui divise par deux environ la mémoire qu'ils
+    occupent, au prix d'un chargement plus lent (pour 5000 organisations
+    reprenant les descriptifs du répertoire actuel : 9,9 Mo au lieu de
+    18,6 Mo, chargement en 0,8 s au lieu de 0,45 s). None pour ne jamais
+    compresser les descriptifs.
+
+    """
+
+    _INTERNED = ('orgtype', 'territories')
+    """Métadonnées optionnelles dont les valeurs (des codes) sont internées."""
+
+    _TRACKED = ('name', 'title', 'label', 'description', 'image_url',
+        'groups', 'extras')
+    """Attributs dont la modification invalide le résultat mémorisé de la validation.
+
+    Les listes et dictionnaires (``groups``, ``extras``) ne sont
+    exposés qu'en lecture seule. Ils ne peuvent être modifiés qu'en
+    étant remplacés ou par l'intermédiaire des méthodes dédiées
+    (:py:meth:`Organization.set`, :py:meth:`Organization.add_territory`,
+    etc.), qui invalident le résultat mémorisé.
+
+    """
+
+    _INDEXED = ('orgtype', 'territories', 'groups')
+    """Propriétés pour lesquelles le répertoire est indexé."""
+
+    _INDEXES = {property: {} for property in _INDEXED}
+    """Index du répertoire.
+
+    Pour chaque propriété indexée (type, territoires de compétence,
+    organisations parentes), dictionnaire dont les clés sont
+    les valeurs de la propriété et les valeurs des ensembles
+    d'identifiants d'organisations.
+
+    """
+
+    _LOCK = threading.RLock()
+    """Verrou des écritures sur le répertoire."""
+
+    _STAGING = None
+    """Copie de travail du répertoire et des index pendant un chargement."""
+
     def __init__(
         self, name, title=None, label=None, description=None,
         image_url=None, groups=None, **kwargs
     ):
         if not name:
             raise ValueError('"name" should be provided')
-        Organization.COLLECTION[name] = self
+        self._valid = None
+        self._logo_status = None
         self.name = name
         self.title = title
         self.label = label
@@ -125,9 +197,9 @@ class Organization:
         clean_groups = []
         for group in groups:
             if isinstance(group, str):
-                clean_groups.append({'name': group})
+                clean_groups.append({'name': sys.intern(group)})
             elif isinstance(group, dict) and 'name' in group:
-                clean_groups.append({'name': group['name']})
+                clean_groups.append({'name': sys.intern(group['name'])})
             else:
                 raise ValueError(f'invalid "groups" for organization {name}')
         self.groups = clean_groups
@@ -147,11 +219,182 @@ class Organization:
                 # dans Organization.PROPERTY_LABELS, mais elles
                 # seront détectées à la validation
                 self.set(property, value)
+        with Organization._LOCK:
+            previous = Organization._registry()[0].get(name)
+            if previous:
+                previous._unindex()
+            Organization._register(name, self)
+            for property in Organization._INDEXED:
+                self._index(property)
 
     def __repr__(self):
         title = self.title or '?'
         return f'Organization < {self.name} | {title} >'
 
+    def __setattr__(self, attr, value):
+        if attr in Organization._TRACKED:
+            object.__setattr__(self, '_valid', None)
+        object.__setattr__(self, attr, value)
+
+    def _index(self, property, add=True):
+        """Met à jour les index du répertoire pour une propriété de l'organisation.
+
+        Les index ne concernent que l'organisation effectivement
+        répertoriée sous l'identifiant considéré, ce qui exclut
+        celles qui ont été remplacées depuis.
+
+        Parameters
+        ----------
+        property : {'orgtype', 'territories', 'groups'}
+            La propriété.
+        add : bool, default True
+            Si ``True``, l'organisation est ajoutée aux
+            index selon la valeur courante de la propriété,
+            sinon elle en est retirée.
+
+        """
+        if property == 'groups':
+            keys = [group['name'] for group in getattr(self, '_groups', None) or []]
+        else:
+            value = getattr(self, '_extras', {}).get(property)
+            keys = value if isinstance(value, list) else [value]
+        self._update_index(property, keys, add=add)
+
+    def _unindex(self):
+        """Retire l'organisation de tous les index du répertoire."""
+        for property in Organization._INDEXED:
+            self._index(property, add=False)
+
+    @classmethod
+    def by_type(cls, orgtype):
+        """Renvoie les organisations d'un type donné.
+
+        Parameters
+        ----------
+        orgtype : str
+            L'identifiant du type d'organisation.
+
+        Returns
+        -------
+        list(Organization)
+            Les organisations, par ordre alphabétique
+            d'identifiant.
+
+        """
+        return cls._lookup('orgtype', orgtype)
+
+    @classmethod
+    def by_territory(cls, territory):
+        """Renvoie les organisations compétentes sur un territoire donné.
+
+        Parameters
+        ----------
+        territory : str
+            L'identifiant du territoire, par exemple ``'D45'``.
+
+        Returns
+        -------
+        list(Organization)
+            Les organisations, par ordre alphabétique
+            d'identifiant.
+
+        """
+        return cls._lookup('territories', territory)
+
+    @classmethod
+    def children(cls, name):
+        """Renvoie les organisations filles d'une organisation.
+
+        Les organisations filles sont celles dont l'organisation
+        considérée figure dans la liste des parents (attribut
+        ``groups``). Pour que l'index soit tenu à jour, cette
+        liste doit être remplacée plutôt que modifiée sur place.
+
+        Parameters
+        ----------
+        name : str
+            L'identifiant de l'organisation parente. Elle n'a
+            pas besoin d'être répertoriée.
+
+        Returns
+        -------
+        list(Organization)
+            Les organisations, par ordre alphabétique
+            d'identifiant.
+
+        """
+        return cls._lookup('groups', name)
+
+    @property
+    def groups(self):
+        """tuple(types.MappingProxyType): Liste des organisations parentes.
+
+        La liste est renvoyée en lecture seule. Pour la modifier,
+        on lui substituera une nouvelle liste de dictionnaires,
+        ce qui tient à jour l'index des organisations filles.
+
+        """
+        return _frozen(self._groups)
+
+    @groups.setter
+    def groups(self, value):
+        self._index('groups', add=False)
+        self._groups = value
+        self._index('groups')
+
+    @property
+    def extras(self):
+        """types.MappingProxyType: Métadonnées optionnelles.
+
+        Le dictionnaire est renvoyé en lecture seule. Il se
+        modifie par :py:meth:`Organization.set`.
+
+        """
+        return _frozen(self._extras)
+
+    @extras.setter
+    def extras(self, value):
+        self._extras = value
+
+    @property
+    def description(self):
+        """str or None: La description de l'organisation.
+
+        Les descriptifs longs (cf. :py:data:`Organization.DESCRIPTION_COMPRESS_MIN`)
+        sont conservés compressés jusqu'à leur première lecture.
+        Le texte est alors décompressé une fois pour toutes et
+        mémorisé à la place de la version compressée. Les exports
+        (:py:attr:`Organization.dict`) décompressent le descriptif
+        sans le mémoriser.
+
+        """
+        description = self._description
+        if isinstance(description, bytes):
+            description = zlib.decompress(description).decode('utf-8')
+            self._description = description
+        return description
+
+    def _description_text(self):
+        """Renvoie la description de l'organisation sans mémoriser le texte décompressé.
+
+        Returns
+        -------
+        str or None
+
+        """
+        description = self._description
+        if isinstance(description, bytes):
+            return zlib.decompress(description).decode('utf-8')
+        return description
+
+    @description.setter
+    def description(self, value):
+        if isinstance(value, str) and \
+            Organization.DESCRIPTION_COMPRESS_MIN is not None and \
+            len(value) >= Organization.DESCRIPTION_COMPRESS_MIN:
+            value = zlib.compress(value.encode('utf-8'))
+        self._description = value
+
     @classmethod
     def search(cls, name):
         """Renvoie l'organisation d'identifiant considéré, si répertoriée.
@@ -195,21 +438,50 @@ class Organization:
     @classmethod
     def clear(cls):
         """Vide le répertoire des organisations."""
-        cls.COLLECTION.clear()
+        cls._reset()
 
     @classmethod
-    def dump(cls, file=None):
+    def dump(cls, file=None, sharded=False, directory=None, prune=False):
         """Exporte le répertoire d'organisations.
 
         Si `file` n'est pas fourni, la méthode remplace le fichier
         ``organizations.json``.
 
+        Avec ``sharded=True``, le répertoire est exporté sous
+        forme fragmentée, avec un fichier par organisation, cf.
+        :py:func:`maintenance.shards.dump_shards`. Seuls les
+        fichiers des organisations modifiées sont réécrits.
+
         Parameters
         ----------
         file : pathlib.Path or str, optional
             Chemin du fichier à créer ou remplacer.
+        sharded : bool, default False
+            Si ``True``, export fragmenté.
+        directory : pathlib.Path or str, optional
+            Pour un export fragmenté, chemin du répertoire. Par
+            défaut, ``shards/organizations`` à la racine du dépôt.
+        prune : bool, default False
+            Pour un export fragmenté, si ``True``, les fichiers des
+            organisations qui ne sont plus répertoriées sont
+            supprimés. À éviter lorsque le répertoire n'a été
+            que partiellement chargé.
+
+        Returns
+        -------
+        list(str) or None
+            Pour un export fragmenté, la liste des identifiants
+            des organisations dont le fichier a été modifié.
 
         """
+        if sharded:
+            return dump_shards(
+                {name: org.dict for name, org in cls.COLLECTION.items()},
+                directory or Organization.SHARDS,
+                index=_shard_index,
+                prune=prune
+            )
+
         if file:
             file_path = Path(file)
         else:
@@ -224,7 +496,10 @@ class Organization:
         file_path.write_text(data,encoding='utf-8')
 
     @classmethod
-    def load(cls, file=None, url=None, append=True, **kwargs):
+    def load(
+        cls, file=None, url=None, append=True, sharded=False,
+        directory=None, orgtype=None, territory=None, **kwargs
+    ):
         """Charge les organisations depuis une source externe.
 
         La source doit être un JSON de structure identique
@@ -234,6 +509,11 @@ class Organization:
         tente de charger les organisations depuis le fichier
         ``organizations.json``.
 
+        Le répertoire n'est substitué qu'une fois la source
+        entièrement chargée. Les fils d'exécution qui le lisent
+        pendant ce temps voient l'ancien répertoire, jamais un
+        état intermédiaire, et il reste inchangé en cas d'erreur.
+
         Parameters
         ----------
         file : pathlib.Path or str, optional
@@ -247,6 +527,21 @@ class Organization:
             à partir de la source. Dans les deux cas les organisations
             communes au répertoire courant et à la source sont remplacées
             selon la source.
+        sharded : bool, default False
+            Si ``True``, les organisations sont chargées depuis un
+            répertoire fragmenté, cf. :py:meth:`Organization.dump`.
+        directory : pathlib.Path or str, optional
+            Pour un chargement depuis un répertoire fragmenté, chemin
+            du répertoire. Par défaut, ``shards/organizations`` à la
+            racine du dépôt.
+        orgtype : str or list(str), optional
+            Pour un chargement depuis un répertoire fragmenté, le
+            ou les types des organisations à charger. Les autres
+            fichiers ne sont pas lus.
+        territory : str or list(str), optional
+            Pour un chargement depuis un répertoire fragmenté, ne
+            charge que les organisations compétentes sur le ou les
+            territoires considérés.
         **kwargs
             Paramètres additionnels à passer à la fonction
             :py:func:``open`` si la source est un fichier,
@@ -255,11 +550,17 @@ class Organization:
 
         """
         if url:
-            params = REQUESTS_CONFIG.copy()
+            params = dict(UserConfig.requests_config())
             params.update(kwargs)
-            response = requests.get(url)
+            response = requests.get(url, **params)
             response.raise_for_status()
             data = response.json()
+        elif sharded:
+            data = load_shards(
+                directory or Organization.SHARDS,
+                orgtype=orgtype,
+                territories=territory
+            )
         else:
             if file:
                 file_path = Path(file)
@@ -271,40 +572,155 @@ class Organization:
                     return
             raw = file_path.read_text(encoding='utf-8')
             data = json.loads(raw)
-        if not append:
-            cls.clear()
-        for org in data:
-            Organization(**data[org])
+        with cls._staging():
+            if not append:
+                cls.clear()
+            for org in data:
+                Organization(**data[org])
+
+    @classmethod
+    def check_logos(cls, force=False, max_workers=8):
+        """Contrôle la disponibilité des logos de toutes les organisations.
+
+        Les requêtes sont exécutées en parallèle, cf.
+        :py:func:`check_urls`.
+
+        Parameters
+        ----------
+        force : bool, default False
+            Si ``True``, les logos déjà contrôlés sont
+            contrôlés à nouveau, sans tenir compte du
+            cache.
+        max_workers : int, default 8
+            Nombre maximal de requêtes simultanées.
+
+        Returns
+        -------
+        list(str)
+            Liste des identifiants des organisations dont
+            le logo est inaccessible.
+
+        """
+        orgs = [
+            org for org in cls.COLLECTION.values() if org.image_url and (
+                force or not org._logo_status
+                or org._logo_status[0] != org.image_url
+            )
+        ]
+        status = check_urls(
+            [org.image_url for org in orgs],
+            max_workers=max_workers,
+            max_age=0 if force else LOGO_CACHE_MAX_AGE
+        )
+        for org in orgs:
+            org._logo_status = (org.image_url, status[org.image_url])
+        return [
+            org.name for org in cls.COLLECTION.values()
+            if org.image_url and not org.check_logo()
+        ]
+
+    def check_logo(self, force=False):
+        """Contrôle la disponibilité du logo de l'organisation.
+
+        Le résultat est mémorisé jusqu'à la prochaine
+        modification de l'URL du logo, et pris en compte
+        par :py:meth:`Organization.validate`.
+
+        Parameters
+        ----------
+        force : bool, default False
+            Si ``True``, le logo est contrôlé même s'il
+            l'a déjà été.
+
+        Returns
+        -------
+        bool or None
+            ``True`` si le logo est accessible, ``False``
+            sinon, None si l'organisation n'a pas de logo.
+
+        """
+        if not self.image_url:
+            return
+        if not force and self._logo_status \
+            and self._logo_status[0] == self.image_url:
+            return self._logo_status[1]
+        status = check_urls(
+            [self.image_url], max_age=0 if force else LOGO_CACHE_MAX_AGE
+        )[self.image_url]
+        self._logo_status = (self.image_url, status)
+        return status
+
+    LOGO_FORMATS = ('svg', 'png', 'jpg')
+    """Formats de logos recherchés sur le registre, par ordre de préférence."""
+
+    def logo_candidates(self):
+        """Renvoie les URL possibles du logo de l'organisation sur le registre Ecosphères.
+
+        Returns
+        -------
+        list(str)
+            Les URL, par ordre de préférence.
 
-    def auto_image_url(self):
+        """
+        return [
+            f'{LOGO_BASE}/{self.name}.{image_format}'
+            for image_format in Organization.LOGO_FORMATS
+        ]
+
+    def auto_image_url(self, status=None):
         """Génère l'URL standard du logo stocké sur le registre Ecosphères.
         
         La fonction vérifie si le logo est
         effectivement disponible sur le registre, sinon
         elle affecte le logo par défaut :py:data:`DEFAULT_LOGO`.
 
+        Parameters
+        ----------
+        status : dict, optional
+            Disponibilité déjà connue des URL candidates, telle
+            que renvoyée par :py:func:`check_urls`. Si non fourni,
+            elle est contrôlée par la méthode.
+
         Returns
         -------
         str
 
         """
-        for image_format in ('svg', 'png', 'jpg'):
-            image_url = f'{LOGO_BASE}/{self.name}.{image_format}'
-            response = requests.get(image_url, **REQUESTS_CONFIG)
-            try:
-                response.raise_for_status()
+        candidates = self.logo_candidates()
+        if status is None:
+            status = check_urls(candidates)
+        for image_url in candidates:
+            if status.get(image_url):
                 return image_url
-            except:
-                continue
         return DEFAULT_LOGO
 
     @classmethod
-    def update_all_image_url(cls):
-        """Met à jour les URL des logos pour toutes les organisations."""
-        for org in cls.COLLECTION.values():
-            org.image_url = org.auto_image_url()
+    def update_all_image_url(cls, max_workers=8, max_age=None):
+        """Met à jour les URL des logos pour toutes les organisations.
+
+        Les URL candidates de toutes les organisations sont
+        contrôlées en une fois, en parallèle, cf. :py:func:`check_urls`.
+
+        Parameters
+        ----------
+        max_workers : int, default 8
+            Nombre maximal de requêtes simultanées.
+        max_age : float, optional
+            Durée de validité des résultats mémorisés, en secondes.
+            Par défaut, :py:data:`maintenance.config.LOGO_CACHE_MAX_AGE`.
+            ``0`` pour contrôler à nouveau toutes les URL.
+
+        """
+        orgs = list(cls.COLLECTION.values())
+        status = check_urls(
+            [url for org in orgs for url in org.logo_candidates()],
+            max_workers=max_workers,
+            max_age=max_age
+        )
+        for org in orgs:
+            org.image_url = org.auto_image_url(status=status)
 
-    def validate(self, silent=False):
+    def validate(self, silent=False, check_logo=False):
         """Vérifie la validité de l'organisation.
         
         Concrètement, une organisation sera présumée valide
@@ -314,12 +730,23 @@ class Organization:
         les éventuels groupes auxquels elle appartient existent
         dans le registre.
 
+        Le résultat des contrôles portant sur l'organisation
+        elle-même est mémorisé jusqu'à sa prochaine modification.
+        Seule l'existence des organisations parentes est
+        systématiquement contrôlée, puisqu'elle dépend du
+        reste du registre.
+
         Parameters
         ----------
         silent : bool
             Si ``True``, la méthode renvoie ``False``
             en cas d'anomalie au lieu de générer une
             erreur.
+        check_logo : bool, default False
+            Si ``True``, la disponibilité du logo est contrôlée
+            (cf. :py:meth:`Organization.check_logo`) si elle ne
+            l'a pas déjà été. Dans tous les cas, un logo dont le
+            dernier contrôle a échoué rend l'organisation invalide.
 
         Returns
         -------
@@ -332,43 +759,58 @@ class Organization:
             À la première anomalie rencontrée.
 
         """
-        err = None
-        if not self.name:
-            err = ValueError('identifiant manquant (name)')
-        elif not self.title:
-            err = ValueError(f'{self.name} : libellé court manquant (title)')
-        elif not self.label:
-            err = ValueError(f'{self.name} : libellé long manquant (label)')
-        elif not self.description:
-            err = ValueError(f'{self.name} : descriptif manquant (description)')
-        elif not self.image_url:
-            err = ValueError(f'{self.name} : logo manquant (image_url)')
-        elif not self.territories:
-            err = ValueError(f'{self.name} : territoire de compétence manquant (territories)')
-        elif self.groups:
-            for group in self.groups:
+        if self._valid is None:
+            self._valid = self._check() or True
+        err = self._valid if self._valid is not True else None
+
+        if not err and self._groups:
+            for group in self._groups:
                 parent = group.get('name')
                 if not parent in Organization.COLLECTION:
                     err = ValueError(f'{self.name} : organisation parente "{parent}" inconnue (groups)')
                     break
-        else:
-            for key in self.extras:
-                if not key in Organization.PROPERTY_LABELS:
-                    err = ValueError(f'{self.name} : métadonnée "{key}" non déclarée')
-                    break
+
+        if not err:
+            if check_logo:
+                self.check_logo()
+            if self._logo_status and \
+                self._logo_status[0] == self.image_url \
+                and not self._logo_status[1]:
+                err = ValueError(f'{self.name} : logo inaccessible (image_url)')
 
         if err:
             if silent:
                 return False
             raise err
 
-        response = requests.get(self.image_url, **REQUESTS_CONFIG)
-        if silent:
-            return False
-        response.raise_for_status()
-
         return True
 
+    def _check(self):
+        """Contrôles de validité ne dépendant que de l'organisation elle-même.
+
+        Returns
+        -------
+        ValueError or None
+            La première anomalie rencontrée, s'il y a lieu.
+
+        """
+        if not self.name:
+            return ValueError('identifiant manquant (name)')
+        if not self.title:
+            return ValueError(f'{self.name} : libellé court manquant (title)')
+        if not self.label:
+            return ValueError(f'{self.name} : libellé long manquant (label)')
+        if not self._description:
+            return ValueError(f'{self.name} : descriptif manquant (description)')
+        if not self.image_url:
+            return ValueError(f'{self.name} : logo manquant (image_url)')
+        if not self._extras.get('territories'):
+            return ValueError(f'{self.name} : territoire de compétence manquant (territories)')
+        if not self._groups:
+            for key in self._extras:
+                if not key in Organization.PROPERTY_LABELS:
+                    return ValueError(f'{self.name} : métadonnée "{key}" non déclarée')
+
     @property
     def dict(self):
         """dict: Dictionnaire des métadonnées de l'organisation.
@@ -376,6 +818,11 @@ class Organization:
         Peut être utilisé tel quel pour créer ou mettre à jour
         l'organisation via l'API de CKAN.
 
+        L'organisation est validée sans requête sur le réseau,
+        cf. :py:meth:`Organization.validate`. Les listes et
+        dictionnaires sont copiés, de sorte que le dictionnaire
+        renvoyé puisse être modifié sans affecter l'organisation.
+
         """
         self.validate()
         d = {
@@ -383,12 +830,14 @@ class Organization:
             'title': self.title,
             'label': self.label,
             'image_url': self.image_url,
-            'description': self.description,
+            'description': self._description_text(),
             'extras': []
         }
-        if self.groups:
-            d['groups'] = self.groups
-        for key, value in self.extras.items():
+        if self._groups:
+            d['groups'] = copy.deepcopy(self._groups)
+        for key, value in self._extras.items():
+            if isinstance(value, (list, dict)):
+                value = copy.deepcopy(value)
             # if isinstance(value, (list, dict)):
             #     value = json.dumps(value, ensure_ascii=False)
             d['extras'].append(
@@ -401,6 +850,10 @@ class Organization:
 
     def get(self, property):
         """Renvoie la valeur d'une métadonnée optionnelle.
+
+        Les listes et dictionnaires sont renvoyés en lecture
+        seule, sous forme de tuples et de
+        :py:class:`types.MappingProxyType`.
         
         Parameters
         ----------
@@ -408,7 +861,7 @@ class Organization:
             L'identifiant de la métadonnée.
 
         """
-        return self.extras.get(property)
+        return _frozen(self._extras.get(property))
 
     def set(self, property, value):
         """Définit la valeur d'une métadonnée optionnelle.
@@ -425,11 +878,19 @@ class Organization:
             pas contrôlée.
 
         """
+        self._valid = None
+        indexed = property in ('orgtype', 'territories')
+        if indexed:
+            self._index(property, add=False)
         if not value:
-            if property in self.extras:
-                del self.extras[property]
+            if property in self._extras:
+                del self._extras[property]
             return
-        self.extras[property] = value
+        if property in Organization._INTERNED:
+            value = _intern(value)
+        self._extras[property] = value
+        if indexed:
+            self._index(property)
 
     @property
     def email(self):
@@ -469,15 +930,15 @@ class Organization:
 
     @property
     def territories(self):
-        """list(str): Territoires de compétence de l'organisation.
+        """tuple(str): Territoires de compétence de l'organisation.
         
-        Le setter de la propriété prend en argument un territoire
+        Les territoires sont renvoyés en lecture seule. Le setter de la propriété prend en argument un territoire
         ou une liste de territoires, qui remplaceront la liste courante.
         Pour ajouter un territoire sans supprimer les autres, on
         utilisera :py:meth:`Organization.add_territory`.
 
         """
-        return self.extras.get('territories')
+        return self.get('territories')
 
     @territories.setter
     def territories(self, value):
@@ -501,11 +962,13 @@ class Organization:
         if not territory:
             return
         
-        if not 'territories' in self.extras:
+        if not 'territories' in self._extras:
             self.territories = territory
         else:
-            self.extras['territories'].append(territory)
-            self.extras['territories'].sort()
+            self._valid = None
+            self._extras['territories'].append(_intern(territory))
+            self._index('territories')
+            self._extras['territories'].sort()
 
     def remove_territory(self, territory):
         """Supprime un territoire de la liste des territoires de compétence de l'organisation.
@@ -519,7 +982,232 @@ class Organization:
         if not territory:
             return
         
-        if 'territories' in self.extras:
-            while territory in self.extras['territories']:
-                self.extras['territories'].remove(territory)
+        if 'territories' in self._extras:
+            self._valid = None
+            self._index('territories', add=False)
+            while territory in self._extras['territories']:
+                self._extras['territories'].remove(territory)
+            self._index('territories')
+
+
+def _shard_index(name, record):
+    """Champs d'index du manifeste de l'export fragmenté des organisations.
+
+    Parameters
+    ----------
+    name : str
+        L'identifiant de l'organisation.
+    record : dict
+        Le dictionnaire des métadonnées de l'organisation,
+        cf. :py:attr:`Organization.dict`.
+
+    Returns
+    -------
+    dict
+        Le type et les territoires de compétence de
+        l'organisation.
+
+    """
+    extras = {
+        Organization.property_from_label(item['key']): item['value']
+        for item in record.get('extras') or []
+    }
+    return {
+        'orgtype': extras.get('orgtype'),
+        'territories': extras.get('territories')
+    }
+
+def _frozen(value):
+    """Renvoie une vue en lecture seule d'une valeur.
+
+    Parameters
+    ----------
+    value : list or dict or object
+        La valeur. Les listes sont converties en tuples, les
+        dictionnaires en :py:class:`types.MappingProxyType`,
+        récursivement. Les autres valeurs sont renvoyées
+        telles quelles.
+
+    Returns
+    -------
+    tuple or types.MappingProxyType or object
+
+    """
+    if isinstance(value, list):
+        return tuple(_frozen(item) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({key: _frozen(item) for key, item in value.items()})
+    return value
+
+def _intern(value):
+    """Interne une chaîne de caractères ou les chaînes d'une liste.
+
+    Les codes (types d'organisations, territoires) sont partagés
+    par de nombreuses organisations, qui référencent ainsi
+    un unique objet.
+
+    Parameters
+    ----------
+    value : str or list
+        La valeur à interner. Les éléments d'une liste qui
+        ne sont pas des chaînes de caractères sont laissés
+        tels quels.
+
+    Returns
+    -------
+    str or list
+
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [
+            sys.intern(item) if isinstance(item, str) else item
+            for item in value
+        ]
+    return value
+
+LOGO_CACHE = Path(maintenance_path[0]) / 'cache' / 'logos.json'
+"""Fichier de cache des contrôles de disponibilité des logos."""
+
+_url_cache_lock = threading.Lock()
+_http = threading.local()
+
+def check_urls(urls, max_workers=8, max_age=None, cache_file=None,
+    timeout=None):
+    """Contrôle la disponibilité de ressources web.
+
+    Les contrôles reposent sur des requêtes ``HEAD``, exécutées en
+    parallèle. Les résultats, positifs comme négatifs, sont mémorisés
+    sur disque avec les en-têtes ``ETag`` et ``Last-Modified`` renvoyés
+    par le serveur. Au-delà de `max_age`, une ressource disponible est
+    de nouveau contrôlée par une requête conditionnelle, qui ne
+    transfère rien si elle n'a pas changé.
+
+    Parameters
+    ----------
+    urls : list(str)
+        Les URL à contrôler.
+    max_workers : int, default 8
+        Nombre maximal de requêtes simultanées.
+    max_age : float, optional
+        Durée de validité des résultats mémorisés, en secondes.
+        Par défaut, :py:data:`maintenance.config.LOGO_CACHE_MAX_AGE`.
+        ``0`` pour contrôler toutes les URL.
+    cache_file : pathlib.Path or str, optional
+        Chemin du fichier de cache. Par défaut,
+        :py:data:`LOGO_CACHE`.
+    timeout : float or tuple(float, float), optional
+        Délais d'attente des requêtes, en secondes. Par défaut,
+        :py:data:`maintenance.config.LOGO_TIMEOUT`. Une ressource
+        dont le serveur ne répond pas dans les délais est
+        considérée comme indisponible.
+
+    Returns
+    -------
+    dict
+        Dictionnaire dont les clés sont les URL et les valeurs
+        ``True`` si la ressource est disponible, ``False`` sinon.
+
+    Notes
+    -----
+    Les erreurs réseau (échec de connexion, délai dépassé...) ne
+    sont pas mémorisées.
+
+    """
+    max_age = LOGO_CACHE_MAX_AGE if max_age is None else max_age
+    timeout = timeout or LOGO_TIMEOUT
+    cache_path = Path(cache_file) if cache_file else LOGO_CACHE
+
+    with _url_cache_lock:
+        try:
+            cache = json.loads(cache_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            cache = {}
+
+    now = time.time()
+    res = {}
+    to_check = []
+    for url in dict.fromkeys(urls):
+        entry = cache.get(url)
+        if entry and now - entry.get('checked', 0) < max_age:
+            res[url] = entry['exists']
+        else:
+            to_check.append(url)
+
+    if to_check:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            entries = executor.map(
+                lambda url: _head(url, cache.get(url), timeout), to_check
+            )
+            for url, entry in zip(to_check, entries):
+                if entry is None:
+                    res[url] = False
+                    continue
+                res[url] = entry['exists']
+                cache[url] = entry
+
+        with _url_cache_lock:
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = cache_path.with_suffix('.tmp')
+                tmp_path.write_text(json.dumps(cache, indent=4),
+                    encoding='utf-8')
+                tmp_path.replace(cache_path)
+            except OSError:
+                pass
+
+    return res
+
+def _head(url, entry=None, timeout=None):
+    """Contrôle la disponibilité d'une ressource web par une requête HEAD.
+
+    Parameters
+    ----------
+    url : str
+        L'URL de la ressource.
+    entry : dict, optional
+        Le résultat mémorisé du précédent contrôle, s'il y
+        a lieu.
+    timeout : float or tuple(float, float), optional
+        Délais d'attente des requêtes, en secondes. Par défaut,
+        :py:data:`maintenance.config.LOGO_TIMEOUT`.
+
+    Returns
+    -------
+    dict or None
+        Le résultat du contrôle, à mémoriser, avec les clés
+        ``'exists'``, ``'checked'``, et le cas échéant ``'etag'``
+        et ``'last_modified'``. None en cas d'erreur réseau,
+        y compris de dépassement des délais d'attente.
+
+    """
+    if not hasattr(_http, 'session'):
+        _http.session = requests.Session()
+    config = UserConfig.requests_config()
+    timeout = timeout or LOGO_TIMEOUT
+    headers = {}
+    if entry and entry.get('exists'):
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    try:
+        response = _http.session.head(url, headers=headers,
+            allow_redirects=True, timeout=timeout, **config)
+        if response.status_code in (405, 501):
+            # serveur ne prenant pas en charge HEAD
+            response = _http.session.get(url, headers=headers,
+                stream=True, timeout=timeout, **config)
+            response.close()
+    except requests.RequestException:
+        return
+    if response.status_code == 304:
+        return dict(entry, checked=time.time())
+    return {
+        'exists': response.ok,
+        'checked': time.time(),
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified')
+    }
 
@@ -0,0 +1,307 @@
+"""Répertoires partagés entre fils d'exécution.
+
+Les répertoires des organisations et des moissonnages
+(:py:attr:`maintenance.organization.Organization.COLLECTION`,
+:py:attr:`maintenance.harvest.Harvest.COLLECTION`) publiés aux
+lecteurs ne sont jamais modifiés sur place. Un lecteur qui a obtenu
+une référence au répertoire, par exemple via :py:meth:`Registry.snapshot`,
+dispose donc d'une vue cohérente, sans verrou, quelles que soient
+les écritures réalisées ensuite par d'autres fils.
+
+Les écritures sont sérialisées par un verrou propre à chaque
+répertoire. Elles portent sur une copie de travail, créée à la
+première écriture qui suit une publication et modifiée sur place
+par les suivantes. Cette copie n'est publiée qu'à la première
+lecture du répertoire ou de ses index, de sorte qu'une série
+d'inscriptions successives ne coûte qu'une copie.
+
+Les chargements en masse sont réalisés sur une copie de travail
+distincte, substituée au répertoire en une fois à la fin du
+chargement (ou abandonnée en cas d'erreur).
+
+"""
+
+from contextlib import contextmanager
+from types import MappingProxyType
+
+class RegistryType(type):
+    """Métaclasse des objets répertoriés.
+
+    Les attributs de classe ``COLLECTION`` et ``_INDEXES`` sont
+    des propriétés qui publient au besoin la copie de travail
+    avant de renvoyer le répertoire ou les index publiés.
+    Les valeurs déclarées dans le corps des classes filles
+    servent à initialiser le répertoire.
+
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        if 'COLLECTION' in namespace:
+            cls._PUBLISHED = (
+                namespace['COLLECTION'],
+                {
+                    property: {
+                        key: frozenset(names)
+                        for key, names in index.items() if names
+                    }
+                    for property, index in namespace['_INDEXES'].items()
+                }
+            )
+            cls._WORKING = None
+
+    @property
+    def COLLECTION(cls):
+        """dict: Le répertoire publié. Ne doit pas être modifié."""
+        return cls._published()[0]
+
+    @property
+    def _INDEXES(cls):
+        """dict: Les index publiés. Ne doivent pas être modifiés."""
+        return cls._published()[1]
+
+
+class Registry(metaclass=RegistryType):
+    """Classe mère des objets répertoriés.
+
+    Les classes filles doivent définir leurs propres attributs
+    de classe ``COLLECTION`` (dictionnaire vide), ``_INDEXES``
+    (dictionnaire dont les clés sont les propriétés indexées et
+    les valeurs des dictionnaires vides), ``_LOCK`` (un
+    :py:class:`threading.RLock`) et ``_STAGING`` (None).
+
+    Seule la composition du répertoire relève de la copie sur
+    écriture. Les objets répertoriés eux-mêmes restent modifiables
+    sur place.
+
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def snapshot(cls):
+        """Renvoie une vue en lecture seule du répertoire.
+
+        La vue n'est pas affectée par les modifications
+        ultérieures du répertoire.
+
+        Returns
+        -------
+        types.MappingProxyType
+
+        """
+        return MappingProxyType(cls.COLLECTION)
+
+    @classmethod
+    def _published(cls):
+        """Renvoie le répertoire et les index publiés, après publication des modifications en attente.
+
+        La copie de travail est publiée telle quelle, les ensembles
+        modifiés des index étant figés, et une nouvelle copie
+        sera créée à la prochaine écriture. Hors modifications
+        en attente, aucun verrou n'est pris.
+
+        Returns
+        -------
+        tuple(dict, dict)
+
+        """
+        if cls._WORKING is not None:
+            with cls._LOCK:
+                if cls._WORKING is not None:
+                    collection, indexes = cls._WORKING
+                    cls._PUBLISHED = (collection, _freeze(indexes))
+                    cls._WORKING = None
+        return cls._PUBLISHED
+
+    @classmethod
+    def _registry(cls):
+        """Renvoie le répertoire et les index courants.
+
+        Pendant un chargement, il s'agit de la copie de travail du
+        chargement, sinon de la copie de travail ordinaire si des
+        modifications sont en attente de publication, ou à défaut
+        du répertoire publié. Les modifications doivent passer
+        par :py:meth:`Registry._register` et
+        :py:meth:`Registry._update_index`. À n'appeler qu'en
+        détenant le verrou.
+
+        Returns
+        -------
+        tuple(dict, dict)
+
+        """
+        if cls._STAGING is not None:
+            return cls._STAGING
+        if cls._WORKING is not None:
+            return cls._WORKING
+        return cls._PUBLISHED
+
+    @classmethod
+    def _writable(cls):
+        """Renvoie le répertoire et les index à modifier.
+
+        Hors chargement, la copie de travail est créée si
+        besoin à partir du répertoire publié. Les index sont
+        copiés superficiellement, leurs ensembles ne l'étant qu'au
+        moment de leur modification. À n'appeler qu'en détenant
+        le verrou.
+
+        Returns
+        -------
+        tuple(dict, dict)
+
+        """
+        if cls._STAGING is not None:
+            return cls._STAGING
+        if cls._WORKING is None:
+            collection, indexes = cls._PUBLISHED
+            cls._WORKING = (
+                dict(collection),
+                {property: dict(index) for property, index in indexes.items()}
+            )
+        return cls._WORKING
+
+    @classmethod
+    def _register(cls, name, record):
+        """Ajoute, remplace ou retire un objet du répertoire.
+
+        Parameters
+        ----------
+        name : str
+            L'identifiant de l'objet.
+        record : Registry or None
+            L'objet, ou None pour le retirer du répertoire.
+            Il n'est pas indexé par cette méthode.
+
+        """
+        with cls._LOCK:
+            collection = cls._writable()[0]
+            if record is None:
+                collection.pop(name, None)
+            else:
+                collection[name] = record
+
+    @classmethod
+    def _reset(cls):
+        """Vide le répertoire et ses index."""
+        with cls._LOCK:
+            empty = ({}, {property: {} for property in cls._registry()[1]})
+            if cls._STAGING is not None:
+                cls._STAGING = empty
+            else:
+                cls._WORKING = None
+                cls._PUBLISHED = empty
+
+    @classmethod
+    @contextmanager
+    def _staging(cls):
+        """Gestionnaire de contexte pour les chargements en masse.
+
+        Le verrou est détenu pendant toute la durée du
+        chargement. Les éventuelles modifications en attente sont
+        publiées au préalable, afin que les lecteurs n'aient pas
+        à attendre la fin du chargement. Les modifications portent
+        ensuite sur une copie de travail du répertoire et de ses
+        index, qui les remplace à la sortie du contexte si aucune
+        erreur n'est survenue. Les contextes imbriqués sont sans
+        effet.
+
+        """
+        with cls._LOCK:
+            if cls._STAGING is not None:
+                yield
+                return
+            collection, indexes = cls._published()
+            cls._STAGING = (
+                dict(collection),
+                {property: dict(index) for property, index in indexes.items()}
+            )
+            try:
+                yield
+                collection, indexes = cls._STAGING
+                cls._PUBLISHED = (collection, _freeze(indexes))
+            finally:
+                cls._STAGING = None
+
+    def _update_index(self, property, keys, add=True):
+        """Ajoute l'objet à un index du répertoire ou l'en retire.
+
+        Seul l'objet effectivement répertorié sous son
+        identifiant est indexé.
+
+        Parameters
+        ----------
+        property : str
+            La propriété indexée.
+        keys : list
+            Les valeurs de la propriété pour l'objet. Seules
+            les chaînes de caractères sont considérées.
+        add : bool, default True
+            Si ``True``, l'objet est ajouté à l'index, sinon
+            il en est retiré.
+
+        """
+        cls = type(self)
+        with cls._LOCK:
+            name = getattr(self, 'name', None)
+            if cls._registry()[0].get(name) is not self:
+                return
+            index = cls._writable()[1][property]
+            for key in keys:
+                if not isinstance(key, str):
+                    continue
+                names = index.get(key)
+                # copie de travail, les ensembles sont
+                # modifiés sur place et figés à la publication
+                if not isinstance(names, set):
+                    names = index[key] = set(names or ())
+                if add:
+                    names.add(name)
+                else:
+                    names.discard(name)
+
+    @classmethod
+    def _lookup(cls, property, key):
+        """Renvoie les objets dont la propriété indexée a la valeur considérée.
+
+        Parameters
+        ----------
+        property : str
+            La propriété indexée.
+        key : str
+            La valeur recherchée.
+
+        Returns
+        -------
+        list
+            Les objets, par ordre alphabétique d'identifiant.
+
+        """
+        collection, indexes = cls._published()
+        names = indexes[property].get(key, ())
+        return [collection[name] for name in sorted(names) if name in collection]
+
+
+def _freeze(indexes):
+    """Fige les ensembles modifiés des index d'une copie de travail.
+
+    Les ensembles vides sont retirés.
+
+    Parameters
+    ----------
+    indexes : dict
+        Les index de la copie de travail.
+
+    Returns
+    -------
+    dict
+
+    """
+    frozen = {}
+    for property, index in indexes.items():
+        frozen[property] = {
+            key: frozenset(names) if isinstance(names, set) else names
+            for key, names in index.items() if names
+        }
+    return frozen
@@ -0,0 +1,171 @@
+"""Stockage fragmenté des répertoires.
+
+Un répertoire fragmenté est un dossier contenant un fichier JSON
+par enregistrement (organisation, moissonnage...), ainsi qu'un
+manifeste ``manifest.json`` qui, pour chaque enregistrement, fournit
+le nom du fichier, l'empreinte de son contenu et quelques champs
+d'index permettant de ne charger qu'une partie du répertoire :
+
+    >>> records = load_shards('shards/harvests', owner_org='ddt-45234-01')
+
+À l'export, seuls les fichiers dont le contenu a changé sont
+réécrits :
+
+    >>> dump_shards(records, 'shards/harvests', index=('owner_org',))
+
+"""
+
+import json
+from hashlib import sha1
+from pathlib import Path
+from urllib.parse import quote
+
+MANIFEST = 'manifest.json'
+"""Nom du fichier manifeste d'un répertoire fragmenté."""
+
+def dump_shards(records, directory, index=None, prune=False):
+    """Exporte des enregistrements dans un répertoire fragmenté.
+
+    Le manifeste suit l'ordre de `records`, les enregistrements
+    conservés qui n'y figurent pas étant placés à la fin.
+
+    Parameters
+    ----------
+    records : dict
+        Les enregistrements à exporter. Les clés sont les
+        identifiants des enregistrements, les valeurs des
+        dictionnaires sérialisables en JSON.
+    directory : pathlib.Path or str
+        Chemin du répertoire. Il sera créé s'il n'existe pas.
+    index : tuple(str) or function, optional
+        Champs d'index à reporter dans le manifeste. Soit une liste
+        de clés des enregistrements, soit une fonction qui prend
+        en argument l'identifiant et l'enregistrement et renvoie
+        le dictionnaire des champs d'index.
+    prune : bool, default False
+        Si ``True``, les fichiers des enregistrements qui ne
+        figurent pas dans `records` sont supprimés. Par défaut,
+        ils sont conservés, ce qui permet d'exporter un répertoire
+        qui n'a été que partiellement chargé.
+
+    Returns
+    -------
+    list(str)
+        Liste des identifiants des enregistrements dont le
+        fichier a été créé, réécrit ou supprimé.
+
+    """
+    dir_path = Path(directory)
+    dir_path.mkdir(parents=True, exist_ok=True)
+    old_manifest = _read_manifest(dir_path)
+    manifest = {}
+    changed = []
+
+    for name, record in records.items():
+        data = json.dumps(record, ensure_ascii=False, indent=4)
+        digest = sha1(data.encode('utf-8')).hexdigest()
+        entry = {'file': shard_file(name), 'hash': digest}
+        if callable(index):
+            entry.update(index(name, record))
+        elif index:
+            entry.update({key: record.get(key) for key in index})
+        file_path = dir_path / entry['file']
+        if old_manifest.get(name, {}).get('hash') != digest \
+            or not file_path.exists():
+            _write(file_path, data)
+            changed.append(name)
+        manifest[name] = entry
+
+    for name, entry in old_manifest.items():
+        if name in records:
+            continue
+        if prune:
+            (dir_path / entry['file']).unlink(missing_ok=True)
+            changed.append(name)
+        else:
+            manifest[name] = entry
+
+    data = json.dumps(manifest, ensure_ascii=False, indent=4)
+    manifest_path = dir_path / MANIFEST
+    if not manifest_path.exists() \
+        or manifest_path.read_text(encoding='utf-8') != data:
+        _write(manifest_path, data)
+
+    return changed
+
+def load_shards(directory, **where):
+    """Charge des enregistrements depuis un répertoire fragmenté.
+
+    Parameters
+    ----------
+    directory : pathlib.Path or str
+        Chemin du répertoire.
+    **where
+        Critères de sélection sur les champs d'index du
+        manifeste. La valeur peut être un littéral ou un ensemble
+        de valeurs admises. Lorsque le champ d'index est une liste
+        (par exemple des territoires), il suffit qu'un de ses
+        éléments soit admis. Seuls les fichiers des enregistrements
+        sélectionnés sont lus.
+
+    Returns
+    -------
+    dict
+        Les enregistrements, dans l'ordre du manifeste.
+
+    Raises
+    ------
+    FileNotFoundError
+        Si le répertoire ou son manifeste n'existe pas.
+
+    """
+    dir_path = Path(directory)
+    if not (dir_path / MANIFEST).exists():
+        raise FileNotFoundError(f'manifest "{dir_path / MANIFEST}" not found')
+    manifest = _read_manifest(dir_path)
+    records = {}
+    for name, entry in manifest.items():
+        if not _match(entry, where):
+            continue
+        raw = (dir_path / entry['file']).read_text(encoding='utf-8')
+        records[name] = json.loads(raw)
+    return records
+
+def shard_file(name):
+    """Renvoie le nom du fichier d'un enregistrement.
+
+    Parameters
+    ----------
+    name : str
+        L'identifiant de l'enregistrement.
+
+    Returns
+    -------
+    str
+
+    """
+    return f"{quote(name, safe='')}.json"
+
+def _match(entry, where):
+    for key, accepted in where.items():
+        if accepted is None:
+            continue
+        if isinstance(accepted, str) or not hasattr(accepted, '__iter__'):
+            accepted = (accepted,)
+        value = entry.get(key)
+        values = value if isinstance(value, list) else (value,)
+        if not any(v in accepted for v in values):
+            return False
+    return True
+
+def _read_manifest(dir_path):
+    manifest_path = dir_path / MANIFEST
+    if not manifest_path.exists():
+        return {}
+    return json.loads(manifest_path.read_text(encoding='utf-8'))
+
+def _write(file_path, data):
+    tmp_path = file_path.with_name(f'{file_path.name}.tmp')
+    tmp_path.write_text(data, encoding='utf-8')
+    tmp_path.replace(file_path)
+
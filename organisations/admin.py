@@ -36,13 +36,26 @@ https://github.com/ckan/ckanext-harvest/blob/master/ckanext/harvest/logic/action
 
 """
 
-import requests, json, re
+import requests, json, re, threading
+from math import ceil, log
+from random import uniform
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from functools import lru_cache
+from hashlib import sha1
+from xml.etree.ElementTree import iterparse
+from urllib.parse import urlsplit
 from pathlib import Path
 from organisations.ogcfilter import parse_constraints
 from owslib.csw import CatalogueServiceWeb
-from time import localtime, strftime
+from owslib.catalogue.csw2 import namespaces as csw_namespaces, schema_location
+from owslib.etree import etree
+from owslib.fes import FilterRequest
+from owslib.util import element_to_string, nspath_eval
+from time import localtime, strftime, monotonic, time, sleep
 
 from organisations import __path__
+from maintenance.shards import dump_shards, load_shards
 
 # pour les tests sur le serveur de recette GéoIDE :
 # import os
@@ -64,6 +77,78 @@ img_dir = "https://raw.githubusercontent.com/ecolabdata/guichetdonnees-public/ma
 
 """
 
+csw_capabilities_ttl = 3600
+"""Durée de validité des capacités (GetCapabilities) mémorisées des serveurs CSW, en secondes.
+
+Cf. :py:func:`csw_client`.
+
+"""
+
+csw_matches_ttl = 86400
+"""Durée de validité des dénombrements de fiches mémorisés, en secondes.
+
+Cf. :py:class:`MatchesCache`.
+
+"""
+
+csw_timeout = 30
+"""Délai d'attente des réponses des serveurs CSW, en secondes.
+
+Cf. :py:func:`csw_client`.
+
+"""
+
+csw_backoff = 1
+"""Délai de base entre deux tentatives d'interrogation d'un serveur CSW, en secondes.
+
+Le délai double à chaque nouvelle tentative, dans la limite de
+:py:data:`csw_backoff_max`, et une durée aléatoire comprise entre
+zéro et ce délai est effectivement attendue.
+Cf. :py:meth:`OgcFilter.csw_matches`.
+
+"""
+
+csw_backoff_max = 60
+"""Délai maximal entre deux tentatives d'interrogation d'un serveur CSW, en secondes.
+
+"""
+
+csw_breaker_threshold = 10
+"""Nombre d'échecs consécutifs au-delà duquel un serveur CSW est considéré comme hors service.
+
+Le serveur n'est alors plus interrogé jusqu'à la fin de l'opération
+en cours, cf. :py:class:`CswHealth`.
+
+"""
+
+csw_concurrency = 2
+"""Nombre maximal de requêtes simultanées sur un même hôte CSW.
+
+S'applique aux hôtes dont aucun serveur répertorié n'a de valeur
+pour :py:attr:`CswRecord.concurrency`. Une modification est prise
+en compte dès la requête suivante. Cf. :py:func:`csw_slot`.
+
+"""
+
+mirror_max_age = 7 * 86400
+"""Ancienneté maximale des données du miroir local pour les dénombrements, en secondes.
+
+L'ancienneté est mesurée depuis la dernière synchronisation
+complète du serveur, seule à prendre en compte les fiches
+supprimées. Au-delà, les dénombrements sont demandés au serveur
+(cf. :py:meth:`MetaCollection.count`) et la synchronisation
+suivante est complète (cf. :py:meth:`organisations.mirror.CswMirror.sync`).
+None pour ne pas limiter l'ancienneté.
+
+"""
+
+mirror_commit_pages = 10
+"""Nombre de pages de fiches enregistrées dans le miroir local entre deux validations de la transaction.
+
+Cf. :py:meth:`organisations.mirror.CswMirror.sync`.
+
+"""
+
 
 class MetaCollection:
     """Accès combiné aux répertoires des serveurs CSW, des organisations et des moissonnages.
@@ -78,6 +163,15 @@ class MetaCollection:
         Répertoire des moissonnages.
     Statistics : Statistics
         Statistiques sur les moissonnages par organisation et serveur CSW.
+    memo : MatchesMemo
+        Dénombrements réalisés depuis le début de la dernière
+        génération des moissonnages ou actualisation des
+        statistiques, cf. :py:meth:`MetaCollection.count`.
+    mirror : organisations.mirror.CswMirror
+        S'il y a lieu, le miroir local des serveurs CSW, à partir
+        duquel sont réalisés les dénombrements relatifs aux
+        serveurs qu'il a synchronisés depuis moins de
+        :py:data:`mirror_max_age` secondes.
 
     Notes
     -----
@@ -89,22 +183,32 @@ class MetaCollection:
     
     """
 
-    def __init__(self):
+    def __init__(self, sharded=False, mirror=None):
         self.csw = CswCollection()
-        self.org = OrgCollection()
-        self.harvest = HarvestCollection()
+        self.org = OrgCollection(sharded=sharded)
+        self.harvest = HarvestCollection(sharded=sharded)
         self.statistics = Statistics()
+        self.memo = MatchesMemo()
+        self.mirror = mirror
         self.build_statistics(update=False)
 
-    def save(self):
+    def save(self, sharded=False):
         """Sauvegarde les modifications des répertoires des organisations et des moissonnages, exporte les statistiques.
 
+        Parameters
+        ----------
+        sharded : bool, default False
+            Si ``True``, les répertoires des organisations
+            et des moissonnages sont sauvegardés sous forme
+            fragmentée, cf. :py:meth:`OrgCollection.save`
+            et :py:meth:`HarvestCollection.save`.
+
         """
-        self.org.save()
-        self.harvest.save()
+        self.org.save(sharded=sharded)
+        self.harvest.save(sharded=sharded)
         self.statistics.export()
 
-    def build_statistics(self, update=True):
+    def build_statistics(self, update=True, use_cache=False, max_workers=8):
         """Génération des statistiques sur les moissonnages.
 
         Parameters
@@ -116,6 +220,20 @@ class MetaCollection:
             jour en parallèle. Si False, les statistiques sont générées
             à partir des valeurs mémorisées. **True par défaut, et
             peut être très long.**
+        use_cache : bool, default False
+            Si True, les dénombrements mémorisés sur disque depuis
+            moins de :py:data:`csw_matches_ttl` secondes sont
+            réutilisés au lieu d'interroger les serveurs, cf.
+            :py:meth:`OgcFilter.csw_matches`. Les nombres de fiches
+            peuvent alors dater de :py:data:`csw_matches_ttl` secondes.
+            Par défaut, tous les dénombrements sont actualisés,
+            comme le veut `update`. Sans effet si `update` vaut False.
+        max_workers : int, default 8
+            Nombre maximal de dénombrements menés simultanément
+            lorsque `update` vaut True. Le nombre de requêtes
+            simultanées sur un même hôte reste en outre limité
+            par :py:attr:`CswRecord.concurrency` ou, à défaut,
+            :py:data:`csw_concurrency`.
         
         """
         stat = self.statistics
@@ -135,21 +253,37 @@ class MetaCollection:
             self.org.values() if not o.get('image_url') ]
 
         if update:
-            stat.harvest_resources = 0
+            csw_health.reset()
+            self.memo.clear()
+            stat.harvested_resources = 0
             stat.harvest_details = []
-            for h in self.harvest.values():
-                n = h.ogc_filter.csw_matches(
+            harvests = list(self.harvest.values())
+
+            def count(h):
+                return self.count(
+                    h.ogc_filter,
                     url_csw = h['url'],
-                    maxtrials = self.csw[h['url']].maxtrials
+                    use_cache = use_cache,
+                    maxtrials = self.csw[h['url']].maxtrials,
+                    with_source = True
                     )
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                counts = list(executor.map(count, harvests))
+
+            # les résultats sont reportés dans l'ordre du répertoire
+            stat.count_sources = {}
+            for h, (n, source) in zip(harvests, counts):
+                stat.count_sources[source] = stat.count_sources.get(source, 0) + 1
                 h.resources = n
-                stat.harvested_resources += n
+                stat.harvested_resources += n or 0
                 stat.harvest_details.append((
                     self.org[h['owner_org']].label_short,
                     self.csw[h['url']].title,
                     h.restricted_to,
                     n
                     ))
+            matches_cache.save()
                 
         else:
             stat.harvested_resources = sum([h.resources for h in self.harvest.values()])
@@ -160,7 +294,8 @@ class MetaCollection:
 
     def build_harvest_sources(self, org_name=None, url_csw=None,
         org_name_exclude=None, url_csw_exclude=None,
-        replace=False, verbose=True, strict=False):
+        replace=False, verbose=True, strict=False, use_cache=True,
+        max_workers=8, speculative=False):
         """Génère des configurations de moissonnage valides pour les CSW x organisations cibles.
 
         La fonction supprime et crée des enregistrements dans le repertoire
@@ -168,6 +303,12 @@ class MetaCollection:
         fin d'exécution, elle met à jour les statistiques (attribut
         :py:attr:`MetaCollection.statistics`).
 
+        Les filtres des différents couples organisation x serveur CSW
+        sont d'abord calculés simultanément. Les moissonnages sont
+        ensuite créés couple par couple, dans le même ordre et avec
+        les mêmes identifiants que si les calculs avaient été menés
+        les uns après les autres.
+
         Parameters
         ----------
         org_name : str or list of str, optional
@@ -197,6 +338,21 @@ class MetaCollection:
             Si True, les anomalies rencontrées provoquent des erreurs.
             Si False, elles sont ignorées, silencieusement ou non selon la
             valeur de `verbose`. False par défaut.
+        use_cache : bool, default True
+            Si True, les dénombrements de fiches mémorisés depuis moins
+            de :py:data:`csw_matches_ttl` secondes sont réutilisés au
+            lieu d'interroger à nouveau les serveurs, cf.
+            :py:meth:`OgcFilter.csw_matches`.
+        max_workers : int, default 8
+            Nombre maximal de couples organisation x serveur CSW
+            traités simultanément. Le nombre de requêtes simultanées
+            sur un même hôte reste en outre limité par
+            :py:attr:`CswRecord.concurrency` ou, à défaut,
+            :py:data:`csw_concurrency`.
+        speculative : bool, default False
+            Si True, les dénombrements nécessaires au calcul des
+            filtres de chaque couple sont menés simultanément, cf.
+            :py:meth:`MetaCollection.filter_from_org`.
         
         """
         if isinstance(org_name, str):
@@ -209,6 +365,43 @@ class MetaCollection:
             # on en fait une liste
             url_csw = [url_csw]
 
+        csw_health.reset()
+        self.memo.clear()
+
+        def allowed(org, csw):
+            return not (
+                ( csw.include is not None and not org.name in csw.include ) \
+                or ( csw.exclude is not None and org.name in csw.exclude ) \
+                or ( org.include is not None and not csw.url in org.include ) \
+                or ( org.exclude is not None and csw.url in org.exclude )
+                )
+
+        # premier passage : calcul simultané des filtres de
+        # tous les couples susceptibles d'en avoir besoin
+        futures = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for name in org_name or self.org.keys():
+                if ( org_name_exclude and name in org_name_exclude ) \
+                    or len(name) > 96 or not name in self.org:
+                    continue
+                for url in url_csw or self.csw.keys():
+                    if ( url_csw_exclude and url in url_csw_exclude ) \
+                        or not url in self.csw \
+                        or not allowed(self.org[name], self.csw[url]):
+                        continue
+                    if not replace and any(v['url'] == url \
+                        and v['owner_org'] == name for v in self.harvest.values()):
+                        continue
+                    futures[(name, url)] = executor.submit(
+                        self._pair_filters, name, url, use_cache, speculative)
+
+        def pair_filters(name, url):
+            future = futures.get((name, url))
+            if future is None:
+                return self._pair_filters(name, url, use_cache, speculative)
+            return future.result()
+
+        # second passage : création des moissonnages, dans l'ordre
         for name in org_name or self.org.keys():
 
             if org_name_exclude and name in org_name_exclude:
@@ -249,10 +442,7 @@ class MetaCollection:
                 csw = self.csw[url]
 
                 # cas d'exclusions pré-définis
-                if ( csw.include is not None and not name in csw.include ) \
-                    or ( csw.exclude is not None and name in csw.exclude ) \
-                    or ( org.include is not None and not url in org.include ) \
-                    or ( org.exclude is not None and url in org.exclude ):
+                if not allowed(org, csw):
                     # si de tels moissonnages existaient, ils n'ont
                     # pas lieu d'être - on les supprime
                     oldH = [ h for h, v in self.harvest.items() if v['url'] == url \
@@ -285,7 +475,7 @@ class MetaCollection:
                 if csw.bypass:
                     f = csw.bypass.get(name)
                     if f:
-                        res = [(f, f.csw_matches(url) or 0, None)]
+                        res = pair_filters(name, url)
 
                 # ... ou dans celle de l'organisation
                 if not res and org.bypass_all:
@@ -329,7 +519,7 @@ class MetaCollection:
                                 " ne le prend pas en charge.".format(csw.title))
                         continue
                     
-                    res = self.filter_from_org(name, url)
+                    res = pair_filters(name, url)
                 
                 if not res:
                     if verbose:
@@ -342,6 +532,8 @@ class MetaCollection:
                     continue
                 for ogc_filter, n, restricted_to in res:
 
+                    ogc_filter = ogc_filter.canonical()
+
                     # génération d'un identifiant de moissonnage
                     for i in range(98):
                         i += 1
@@ -403,6 +595,8 @@ class MetaCollection:
                                 " ({})".format(restricted_to) if restricted_to else ""
                                 ))
 
+        matches_cache.save()
+
         # mise à jour des statistiques
         self.build_statistics(update=False)
         if verbose:
@@ -509,7 +703,112 @@ class MetaCollection:
             print("Les statistiques ont été mise à jour.")
         
 
-    def filter_from_org(self, org_name, url_csw):
+    def count(self, ogc_filter, url_csw, use_cache=True, maxtrials=30,
+        with_source=False):
+        """Dénombre les fiches renvoyées par un filtre sur un serveur du répertoire.
+
+        Contrairement à :py:meth:`OgcFilter.csw_matches`, cette
+        méthode tire parti des dénombrements déjà réalisés
+        (cf. :py:attr:`MetaCollection.memo`) : un filtre déjà
+        évalué n'est pas soumis une seconde fois au serveur, et
+        les combinaisons ``AND`` incluant une combinaison dont on
+        sait qu'elle ne renvoie aucune fiche sont retirées du
+        filtre avant l'interrogation - voire la rendent inutile.
+
+        Si le serveur a été complètement synchronisé dans le miroir
+        local (cf. :py:attr:`MetaCollection.mirror`) depuis moins de
+        :py:data:`mirror_max_age` secondes, le dénombrement est
+        réalisé sur celui-ci. Le serveur n'est interrogé que si
+        le miroir est trop ancien ou ne prend pas en charge
+        le filtre.
+
+        Parameters
+        ----------
+        ogc_filter : OgcFilter
+            Un filtre OGC.
+        url_csw : str
+            URL du serveur CSW (attribut :py:attr:`CswRecord.url`
+            et clé du répertoire des CSW).
+        use_cache : bool, default True
+            Cf. :py:meth:`OgcFilter.csw_matches`.
+        maxtrials : int, default 30
+            Cf. :py:meth:`OgcFilter.csw_matches`.
+        with_source : bool, default False
+            Si True, la méthode renvoie également l'origine
+            du dénombrement.
+
+        Returns
+        -------
+        int or tuple(int, str)
+            Nombre de fiches. None si le dénombrement a échoué.
+            Si `with_source` vaut True, tuple dont le second
+            élément est l'origine du dénombrement : ``'memo'``
+            (:py:attr:`MetaCollection.memo`), ``'mirror'``
+            (:py:attr:`MetaCollection.mirror`) ou ``'csw'``
+            (le serveur ou les dénombrements mémorisés sur
+            disque, cf. :py:meth:`OgcFilter.csw_matches`).
+
+        """
+        query = ogc_filter.canonical()
+        n, reduced = self.memo.lookup(url_csw, query)
+        source = 'memo'
+        if n is None and self.mirror is not None:
+            age = self.mirror.age(url_csw)
+            if age is not None and (mirror_max_age is None \
+                or age <= mirror_max_age):
+                try:
+                    n = self.mirror.count(url_csw, reduced)
+                    source = 'mirror'
+                except ValueError:
+                    pass
+        if n is None:
+            n = reduced.csw_matches(url_csw, maxtrials=maxtrials,
+                use_cache=use_cache, concurrency=self.csw[url_csw].concurrency)
+            source = 'csw'
+        if n is not None and source != 'memo':
+            self.memo.record(url_csw, reduced, n)
+        return (n, source) if with_source else n
+
+    def _pair_filters(self, org_name, url_csw, use_cache=True,
+        speculative=False):
+        """Calcule les filtres d'un couple organisation x serveur CSW.
+
+        Reproduit, sans rien imprimer ni modifier, le choix opéré
+        par :py:meth:`MetaCollection.build_harvest_sources` entre
+        le filtre pré-défini dans la configuration du serveur et
+        les filtres générés par :py:meth:`MetaCollection.filter_from_org`.
+        Peut être appelée depuis plusieurs fils d'exécution.
+
+        Returns
+        -------
+        list of tuples or None
+            Cf. :py:meth:`MetaCollection.filter_from_org`. None si
+            aucun filtre ne peut être défini.
+
+        """
+        csw = self.csw[url_csw]
+        org = self.org[org_name]
+
+        f = csw.bypass.get(org_name)
+        if f:
+            return [(f, self.count(f, url_csw, use_cache=use_cache) or 0, None)]
+
+        if org.bypass_all:
+            if not validate(org.bypass_all, csw.operators):
+                return
+        elif not "NOT" in csw.operators and org.base_filter \
+            and any([e[0].upper()=="NOT" for e in org.base_filter]):
+            return
+
+        if not "NOT" in csw.operators and csw.base_filter \
+            and any([e[0].upper()=="NOT" for e in csw.base_filter]):
+            return
+
+        return self.filter_from_org(org_name, url_csw, use_cache=use_cache,
+            speculative=speculative)
+
+    def filter_from_org(self, org_name, url_csw, use_cache=True,
+        speculative=False, max_workers=6):
         """Génère un filtre OGC standard à partir du nom d'une organisation.
 
         Parameters
@@ -522,6 +821,24 @@ class MetaCollection:
             :py:attr:`CswRecord.url` et clé du répertoire des CSW).
             La fonction tient compte des spécificité identifiées
             pour certains serveurs dans la syntaxe des filtres.
+        use_cache : bool, default True
+            Si True, les dénombrements de fiches mémorisés depuis moins
+            de :py:data:`csw_matches_ttl` secondes sont réutilisés,
+            cf. :py:meth:`OgcFilter.csw_matches`.
+        speculative : bool, default False
+            Si True, tous les filtres que la méthode est susceptible
+            d'évaluer sont construits d'emblée et dénombrés
+            simultanément, avant que les filtres ne soient choisis
+            à partir de ces résultats. Le résultat est identique,
+            mais obtenu en un temps proche de celui d'un seul
+            dénombrement, au prix de requêtes éventuellement
+            superflues.
+        max_workers : int, default 6
+            Nombre maximal de dénombrements menés simultanément
+            lorsque `speculative` vaut True. Le nombre de requêtes
+            simultanées sur le serveur reste en outre limité par
+            :py:attr:`CswRecord.concurrency` ou, à défaut,
+            :py:data:`csw_concurrency`.
 
         Returns
         --------
@@ -536,6 +853,38 @@ class MetaCollection:
             
             La méthode renvoie None si aucun filtre fonctionnel n'a été trouvé.
         
+        """
+        def count(ogc_filter):
+            return self.count(ogc_filter, url_csw, use_cache=use_cache)
+
+        if speculative:
+            # premier passage à blanc : en supposant qu'aucun
+            # filtre ne renvoie de fiche, on parcourt toutes les
+            # branches et on recense tous les filtres envisageables
+            candidates = {}
+
+            def probe(ogc_filter):
+                f = ogc_filter.canonical()
+                candidates.setdefault(f.hash(), f)
+                return 0
+
+            self._filter_cascade(org_name, url_csw, probe)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(count, candidates.values()))
+            # les dénombrements sont désormais dans self.memo
+
+        res = self._filter_cascade(org_name, url_csw, count)
+        matches_cache.save()
+        return res
+
+    def _filter_cascade(self, org_name, url_csw, count):
+        """Choisit les filtres d'une organisation sur un serveur.
+
+        Cf. :py:meth:`MetaCollection.filter_from_org`, dont cette
+        méthode met en oeuvre la logique, les dénombrements étant
+        réalisés par la fonction `count`, qui prend un filtre OGC
+        en argument et renvoie un nombre de fiches.
+
         """
         csw = self.csw[url_csw]
         org = self.org[org_name]
@@ -586,7 +935,7 @@ class MetaCollection:
                         [ ["PropertyIsLike", "OrganisationName", f(k)] \
                             for k in org.type_keywords ]
                         )
-                    n = ogc_filter.csw_matches(url_csw)
+                    n = count(ogc_filter)
                     if not "OR" in operators:
                         if not n:
                             ogc_filter = OgcFilter()
@@ -600,7 +949,7 @@ class MetaCollection:
                         org_base + csw.base_filter + restrict_filter + \
                         [ ["PropertyIsLike", "OrganisationName", f(org.type_short)] ]
                         )
-                    n = ogc_filter.csw_matches(url_csw)
+                    n = count(ogc_filter)
                     if not "OR" in operators and not n:
                         ogc_filter = OgcFilter()
                 end = True
@@ -614,7 +963,7 @@ class MetaCollection:
                     [ ["PropertyIsLike", "OrganisationName", f(k)] \
                         for k in org.unit_keywords ]
                     )
-                n = ogc_filter.csw_matches(url_csw)
+                n = count(ogc_filter)
                 if not "OR" in operators:
                     if not n:
                         ogc_filter = OgcFilter()
@@ -634,7 +983,7 @@ class MetaCollection:
                         [ ["PropertyIsLike", "OrganisationName", f(org.area_code)], \
                             ["PropertyIsLike", "OrganisationName", f(org.type_short)] ]
                         )
-                    n = ogc_filter.csw_matches(url_csw)
+                    n = count(ogc_filter)
                     if not "OR" in operators:
                         if not n:
                             ogc_filter = OgcFilter()
@@ -655,7 +1004,7 @@ class MetaCollection:
                         [ ["PropertyIsLike", "OrganisationName", f(k)] \
                             for k in org.type_keywords + [f(org.area_code)] ]
                         )
-                    n = ogc_filter.csw_matches(url_csw)
+                    n = count(ogc_filter)
                     if not "OR" in operators:
                         if not n:
                             ogc_filter = OgcFilter()
@@ -681,7 +1030,7 @@ class MetaCollection:
                         [ ["PropertyIsLike", "OrganisationName", f(k)] \
                             for k in org.area_keywords + [f(org.type_short)] ]
                         )
-                    n = ogc_filter.csw_matches(url_csw)
+                    n = count(ogc_filter)
                     if not "OR" in operators:
                         if not n:
                             ogc_filter = OgcFilter()
@@ -702,7 +1051,7 @@ class MetaCollection:
                         [ ["PropertyIsLike", "OrganisationName", f(k)] \
                         for k in org.area_keywords + org.type_keywords ]
                         )
-                    n = ogc_filter.csw_matches(url_csw)
+                    n = count(ogc_filter)
                     if not "OR" in operators:
                         if not n:
                             ogc_filter = OgcFilter()
@@ -719,10 +1068,10 @@ class MetaCollection:
                     )
 
             if ogc_filter:
-                n = ogc_filter.csw_matches(url_csw)
+                n = count(ogc_filter)
                 if n:
                     res.append((ogc_filter, n, restricted_to))
-                
+
         return res if res else None
 
 
@@ -780,6 +1129,10 @@ class Statistics:
         Liste des organisations qui n'ont pas de descriptif.
     org_no_logo : list of str
         Liste des organisations qui n'ont pas de logo.
+    count_sources : dict
+        Pour la dernière actualisation des nombres de fiches,
+        nombre de dénombrements par origine (``'memo'``,
+        ``'mirror'``, ``'csw'``), cf. :py:meth:`MetaCollection.count`.
 
     Notes
     -----
@@ -796,6 +1149,7 @@ class Statistics:
         self.orphan_csw = []
         self.org_no_description = []
         self.org_no_logo = []
+        self.count_sources = {}
 
     def export(self):
         """Exporte les statistiques au format Markdown.
@@ -916,6 +1270,14 @@ class OrgCollection(dict):
     des organisations (:py:attr:`OrgRecord.name`) et ses valeurs
     des objets de classe :py:class:`OrgRecord` décrivant les organisations.
     
+    Parameters
+    ----------
+    sharded : bool, default False
+        Si ``True``, le répertoire est initialisé à partir
+        de sa sauvegarde fragmentée, dans le dossier
+        ``shards/organisations``, au lieu du fichier
+        ``organisations.json``.
+
     Notes
     -----
     Le répertoire est initialisé avec le contenu des fichiers
@@ -924,10 +1286,15 @@ class OrgCollection(dict):
     modifications réalisées dans ``organisations.json``.
     
     """
+
+    SHARDS = Path(__path__[0]) / 'shards' / 'organisations'
+    """Dossier de la sauvegarde fragmentée du répertoire des organisations."""
     
-    def __init__(self):
+    def __init__(self, sharded=False):
         p = Path(__path__[0]) / 'organisations.json'
-        if p.exists() and p.is_file():
+        if sharded:
+            d = load_shards(OrgCollection.SHARDS)
+        elif p.exists() and p.is_file():
             with open(p, encoding='utf-8') as src:
                 d = json.load(src)
         else:
@@ -945,11 +1312,24 @@ class OrgCollection(dict):
                 for k, v in d.items() })
 
 
-    def save(self):
+    def save(self, sharded=False):
         """Sauvegarde les modifications du répertoire.
+
+        Parameters
+        ----------
+        sharded : bool, default False
+            Si ``True``, le répertoire est sauvegardé sous forme
+            fragmentée, avec un fichier par organisation dans le
+            dossier ``shards/organisations``. Seuls les fichiers des
+            organisations modifiées sont réécrits, cf.
+            :py:func:`maintenance.shards.dump_shards`.
         
         """
         self.sort()
+        if sharded:
+            dump_shards(self, OrgCollection.SHARDS,
+                index=lambda name, org: {'type': org.type}, prune=True)
+            return
         p = Path(__path__[0]) / 'organisations.json'
         if p.exists() and p.is_file():
             with open(p, 'w', encoding='utf-8') as dest:
@@ -1357,6 +1737,14 @@ class HarvestCollection(dict):
     https://github.com/ckan/ckanext-harvest/blob/master/ckanext/harvest/
     logic/action/create.py.
     
+    Parameters
+    ----------
+    sharded : bool, default False
+        Si ``True``, le répertoire est initialisé à partir
+        de sa sauvegarde fragmentée, dans le dossier
+        ``shards/moissonnages``, au lieu du fichier
+        ``moissonnages.json``.
+
     Notes
     -----
     Le répertoire est initialisé avec le contenu du fichier
@@ -1365,9 +1753,14 @@ class HarvestCollection(dict):
     
     """
 
-    def __init__(self):
+    SHARDS = Path(__path__[0]) / 'shards' / 'moissonnages'
+    """Dossier de la sauvegarde fragmentée du répertoire des moissonnages."""
+
+    def __init__(self, sharded=False):
         p = Path(__path__[0]) / 'moissonnages.json'
-        if p.exists() and p.is_file():
+        if sharded:
+            d = load_shards(HarvestCollection.SHARDS)
+        elif p.exists() and p.is_file():
             with open(p, encoding='utf-8') as src:
                 d = json.load(src)
         else:
@@ -1376,11 +1769,25 @@ class HarvestCollection(dict):
         if d:
             self.update({ k: HarvestRecord(v) for k, v in d.items() })
 
-    def save(self):
+    def save(self, sharded=False):
         """Sauvegarde les modifications du répertoire.
+
+        Parameters
+        ----------
+        sharded : bool, default False
+            Si ``True``, le répertoire est sauvegardé sous forme
+            fragmentée, avec un fichier par moissonnage dans le
+            dossier ``shards/moissonnages``. Seuls les fichiers des
+            moissonnages modifiés sont réécrits, cf.
+            :py:func:`maintenance.shards.dump_shards`. L'ordre
+            du répertoire est celui du manifeste.
         
         """
         self.sort()
+        if sharded:
+            dump_shards(self, HarvestCollection.SHARDS,
+                index=('owner_org', 'url'), prune=True)
+            return
         p = Path(__path__[0]) / 'moissonnages.json'
         if p.exists() and p.is_file():
             with open(p, 'w', encoding='utf-8') as dest:
@@ -1513,6 +1920,9 @@ class CswRecord:
         Fonction à appliquer aux chaînes de caractères arguments des
         ``PropertyIsLike``. Concrètement, met ou non des ``%`` autour des termes
         selon le serveur.
+    concurrency : int
+        S'il y a lieu, nombre maximal de requêtes simultanées sur l'hôte
+        du serveur. Si non renseigné, :py:data:`csw_concurrency` s'applique.
         
     """
     
@@ -1532,6 +1942,11 @@ class CswRecord:
         self.restrictions = csw.get('restrictions')
         self.include = csw.get('include')
         self.exclude = csw.get('exclude')
+        self.concurrency = csw.get('concurrency')
+        if self.concurrency:
+            # la limite de l'hôte tient compte de tous ses serveurs
+            # répertoriés, même ceux qui ne sont pas interrogés
+            csw_slot(url, self.concurrency)
         self.operators = csw.get('operators') or \
             ["AND", "OR", "NOT"]
 
@@ -1974,9 +2389,110 @@ class OgcFilter(list):
         if raw_filter:
             self += raw_filter
 
-    def csw_matches(self, url_csw, maxtrials=30, strict=False):
+    def key(self):
+        """Renvoie une sérialisation du filtre, utilisable comme clé.
+
+        Returns
+        -------
+        str
+
+        """
+        return json.dumps(self, ensure_ascii=False, separators=(',', ':'),
+            sort_keys=True)
+
+    def canonical(self):
+        """Renvoie la forme canonique du filtre.
+
+        Deux filtres équivalents à l'ordre et aux répétitions
+        près ont la même forme canonique. Celle-ci est obtenue :
+
+        * en écrivant ``Not`` la négation des conditions
+          élémentaires, quelle que soit sa casse d'origine ;
+        * en supprimant les conditions répétées au sein d'une
+          combinaison ``AND`` et en les triant ;
+        * en supprimant les combinaisons ``OR`` redondantes,
+          c'est-à-dire celles qui incluent toutes les conditions
+          d'une autre combinaison (``A OR (A AND B)`` se
+          réduit à ``A``) ;
+        * en triant les combinaisons restantes.
+
+        Une combinaison réduite à une condition est écrite
+        comme une condition élémentaire.
+
+        Returns
+        -------
+        OgcFilter
+
+        """
+        branches = []
+        for e in self:
+            branch = {}
+            for term in ([e] if isinstance(e[0], str) else e):
+                term = list(term)
+                if term[0].lower() == 'not':
+                    term[0] = 'Not'
+                branch.setdefault(_term_key(term), term)
+            if branch:
+                branches.append(branch)
+
+        kept = []
+        # les combinaisons les plus courtes d'abord, pour
+        # qu'elles absorbent celles qui les incluent
+        for branch in sorted(branches, key=len):
+            if not any(k.keys() <= branch.keys() for k in kept):
+                kept.append(branch)
+
+        f = OgcFilter()
+        for branch in sorted(kept, key=sorted):
+            terms = [ branch[k] for k in sorted(branch) ]
+            f.append(terms[0] if len(terms) == 1 else terms)
+        return f
+
+    def conjunctions(self):
+        """Renvoie les combinaisons ``AND`` du filtre.
+
+        Cette méthode suppose un filtre sous forme canonique
+        (cf. :py:meth:`OgcFilter.canonical`).
+
+        Returns
+        -------
+        list of frozenset
+            Pour chaque combinaison ``OR`` du filtre, l'ensemble
+            des clés de ses conditions élémentaires.
+
+        """
+        return [ frozenset(_term_key(term) for term in \
+            ([e] if isinstance(e[0], str) else e)) for e in self ]
+
+    def hash(self):
+        """Renvoie une empreinte stable du filtre.
+
+        L'empreinte est calculée sur la forme canonique du
+        filtre (cf. :py:meth:`OgcFilter.canonical`). Elle est
+        donc identique pour deux filtres équivalents.
+
+        Returns
+        -------
+        str
+
+        """
+        return sha1(self.canonical().key().encode('utf-8')).hexdigest()
+
+    def csw_matches(self, url_csw, maxtrials=30, strict=False, use_cache=True,
+        concurrency=None):
         """Dénombre les fiches de métadonnées renvoyées par le filtre sur un CSW.
 
+        Le serveur est interrogé avec la forme canonique du filtre,
+        cf. :py:meth:`OgcFilter.canonical`, par une requête qui ne
+        renvoie que le nombre de fiches, cf. :py:func:`csw_hits`.
+        Les résultats sont mémorisés, cf. :py:data:`matches_cache`.
+
+        En cas d'échec, la requête est renouvelée après un délai
+        aléatoire croissant (cf. :py:data:`csw_backoff`). Le nombre
+        de tentatives est adapté à la fiabilité constatée du serveur
+        et un serveur qui semble hors service n'est plus interrogé,
+        cf. :py:class:`CswHealth`.
+
         Parameters
         ----------
         url_csw : str
@@ -1986,26 +2502,58 @@ class OgcFilter(list):
         maxtrials : int, default 30
             Nombre maximal de tentatives d'interrogation du serveur
             avant que la fonction ne se résolve à renvoyer une erreur.
+            Le nombre de tentatives effectivement réalisées peut
+            être moindre, cf. :py:meth:`CswHealth.trials`.
         strict : bool, default False
             Si True, la fonction renvoie une erreur quand le serveur
-            retourne une erreur.
+            retourne une erreur, ou s'il est considéré comme hors
+            service.
+        use_cache : bool, default True
+            Si True, un dénombrement mémorisé depuis moins de
+            :py:data:`csw_matches_ttl` secondes est renvoyé sans
+            interroger le serveur. Dans tous les cas, le résultat
+            d'une interrogation réussie est mémorisé.
+        concurrency : int, optional
+            Nombre maximal de requêtes simultanées sur l'hôte
+            du serveur, cf. :py:func:`csw_slot`.
         
         Returns
         -------
         int
-            Nombre de fiches.
+            Nombre de fiches. None si le dénombrement a échoué.
+
+        Raises
+        ------
+        CswUnavailableError
+            Si `strict` vaut True et que le serveur est considéré
+            comme hors service.
         
         """
-        while maxtrials:
-            maxtrials -= 1
+        query = self.canonical()
+        key = query.hash()
+        if use_cache:
+            n = matches_cache.get(url_csw, key)
+            if n is not None:
+                return n
+        for trial in range(csw_health.trials(url_csw, maxtrials)):
+            if trial:
+                sleep(uniform(0, min(csw_backoff_max, csw_backoff * 2 ** (trial - 1))))
+            if not csw_health.available(url_csw):
+                if strict:
+                    raise CswUnavailableError("Le serveur CSW '{}' est " \
+                        "considéré comme hors service.".format(url_csw))
+                return
             try:
-                csw = CatalogueServiceWeb(url_csw)
-                csw.getrecords2(parse_constraints(self))
-                return csw.results['matches']
+                with csw_slot(url_csw, concurrency):
+                    n = csw_hits(url_csw, query)
             except Exception as err:
+                csw_health.record(url_csw, False)
                 if strict:
                     raise err
-                continue        
+                continue
+            csw_health.record(url_csw, True)
+            matches_cache.set(url_csw, key, n)
+            return n
         
 
 class CswImportError(Exception):
@@ -2023,6 +2571,529 @@ class OrgImportError(Exception):
 
     """
 
+class CswUnavailableError(Exception):
+    """Erreur lorsqu'un serveur CSW est considéré comme hors service.
+
+    """
+
+class CswHealth:
+    """Suivi de la fiabilité des serveurs CSW.
+
+    Pour chaque serveur, l'objet comptabilise les requêtes réussies
+    et échouées. Il en déduit le nombre de tentatives raisonnable
+    pour un dénombrement (cf. :py:meth:`CswHealth.trials`), et
+    considère le serveur comme hors service - disjoncteur ouvert -
+    après :py:data:`csw_breaker_threshold` échecs consécutifs.
+
+    Les disjoncteurs sont refermés au début de chaque opération
+    (:py:meth:`MetaCollection.build_harvest_sources`,
+    :py:meth:`MetaCollection.build_statistics`), par
+    :py:meth:`CswHealth.reset`. Les statistiques de fiabilité
+    sont conservées d'une opération à l'autre. Les méthodes
+    peuvent être appelées depuis plusieurs fils d'exécution.
+
+    """
+
+    def __init__(self):
+        # url -> [réussites, échecs, échecs consécutifs]
+        self._servers = {}
+        self._lock = threading.Lock()
+
+    def record(self, url_csw, success):
+        """Enregistre le résultat d'une requête.
+
+        Parameters
+        ----------
+        url_csw : str
+            URL du serveur CSW.
+        success : bool
+            True si la requête a abouti.
+
+        """
+        with self._lock:
+            stats = self._servers.setdefault(url_csw, [0, 0, 0])
+            if success:
+                stats[0] += 1
+                stats[2] = 0
+            else:
+                stats[1] += 1
+                stats[2] += 1
+
+    def available(self, url_csw):
+        """Le serveur peut-il être interrogé ?
+
+        Parameters
+        ----------
+        url_csw : str
+            URL du serveur CSW.
+
+        Returns
+        -------
+        bool
+            False si le disjoncteur du serveur est ouvert.
+
+        """
+        with self._lock:
+            stats = self._servers.get(url_csw)
+            return not stats or stats[2] < csw_breaker_threshold
+
+    def trials(self, url_csw, maxtrials):
+        """Renvoie le nombre de tentatives à consacrer à un dénombrement.
+
+        Il s'agit du nombre de tentatives nécessaires pour que,
+        compte tenu du taux d'échec constaté sur le serveur, la
+        probabilité que toutes échouent soit inférieure à 1 %.
+        Le taux d'échec est estimé avec un lissage de Laplace, soit
+        50 % - et donc 7 tentatives - en l'absence d'observations.
+
+        Parameters
+        ----------
+        url_csw : str
+            URL du serveur CSW.
+        maxtrials : int
+            Nombre maximal de tentatives.
+
+        Returns
+        -------
+        int
+            Un nombre compris entre 1 et `maxtrials`.
+
+        """
+        with self._lock:
+            successes, failures, _ = self._servers.get(url_csw, (0, 0, 0))
+        rate = (failures + 1) / (successes + failures + 2)
+        return max(1, min(maxtrials, ceil(log(0.01) / log(rate))))
+
+    def reset(self, url_csw=None):
+        """Referme les disjoncteurs.
+
+        Parameters
+        ----------
+        url_csw : str, optional
+            Si fourni, seul le disjoncteur du serveur
+            considéré est refermé.
+
+        """
+        with self._lock:
+            for url, stats in self._servers.items():
+                if url_csw is None or url == url_csw:
+                    stats[2] = 0
+
+
+csw_health = CswHealth()
+"""Suivi de la fiabilité des serveurs CSW utilisé par :py:meth:`OgcFilter.csw_matches`."""
+
+class MatchesMemo:
+    """Mémoire des dénombrements réalisés au cours d'une opération.
+
+    Outre les dénombrements eux-mêmes, l'objet retient, pour
+    chaque serveur, les combinaisons ``AND`` de conditions qui ne
+    renvoient aucune fiche. Toute combinaison qui les inclut -
+    et qui ne peut donc pas davantage renvoyer de fiche - est
+    ignorée lors des dénombrements suivants. Les méthodes
+    peuvent être appelées depuis plusieurs fils d'exécution.
+
+    Cf. :py:meth:`MetaCollection.count`.
+
+    """
+
+    def __init__(self):
+        # url -> (ensemble de combinaisons sans résultat,
+        # dictionnaire empreinte -> dénombrement)
+        self._servers = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, url_csw, ogc_filter):
+        """Cherche le dénombrement d'un filtre.
+
+        Parameters
+        ----------
+        url_csw : str
+            URL du serveur CSW.
+        ogc_filter : OgcFilter
+            Un filtre sous forme canonique.
+
+        Returns
+        -------
+        tuple(int or None, OgcFilter)
+            Le dénombrement, s'il est connu, et le filtre
+            débarrassé des combinaisons dont on sait qu'elles
+            ne renvoient aucune fiche. Si aucune combinaison ne
+            subsiste, le dénombrement vaut 0.
+
+        """
+        with self._lock:
+            zeros, counts = self._servers.get(url_csw, ((), {}))
+            reduced = OgcFilter([ e for e, c in \
+                zip(ogc_filter, ogc_filter.conjunctions()) \
+                if not any(z <= c for z in zeros) ])
+            if not reduced:
+                return 0, reduced
+            return counts.get(reduced.hash()), reduced
+
+    def record(self, url_csw, ogc_filter, matches):
+        """Mémorise le dénombrement d'un filtre.
+
+        Parameters
+        ----------
+        url_csw : str
+            URL du serveur CSW.
+        ogc_filter : OgcFilter
+            Un filtre sous forme canonique.
+        matches : int
+            Le nombre de fiches renvoyées par le filtre.
+
+        """
+        with self._lock:
+            zeros, counts = self._servers.setdefault(url_csw, (set(), {}))
+            counts[ogc_filter.hash()] = matches
+            if not matches:
+                zeros.update(ogc_filter.conjunctions())
+
+    def clear(self):
+        """Oublie tous les dénombrements."""
+        with self._lock:
+            self._servers.clear()
+
+
+class MatchesCache:
+    """Mémoire persistante des dénombrements de fiches par filtre et serveur CSW.
+
+    Les dénombrements sont conservés dans un fichier JSON,
+    chargé à la première lecture et réécrit par :py:meth:`MatchesCache.save`.
+    Les méthodes peuvent être appelées depuis plusieurs fils
+    d'exécution.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        Chemin du fichier.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._data is None:
+            try:
+                with open(self.path, encoding='utf-8') as src:
+                    self._data = json.load(src)
+            except (OSError, ValueError):
+                self._data = {}
+
+    def get(self, url_csw, key):
+        """Renvoie le dénombrement mémorisé pour un filtre, s'il n'est pas périmé.
+
+        Parameters
+        ----------
+        url_csw : str
+            URL du serveur CSW.
+        key : str
+            Empreinte du filtre, cf. :py:meth:`OgcFilter.hash`.
+
+        Returns
+        -------
+        int or None
+
+        """
+        with self._lock:
+            self._load()
+            entry = self._data.get(url_csw, {}).get(key)
+        if entry and time() - entry[1] < csw_matches_ttl:
+            return entry[0]
+
+    def set(self, url_csw, key, matches):
+        """Mémorise le dénombrement d'un filtre.
+
+        Parameters
+        ----------
+        url_csw : str
+            URL du serveur CSW.
+        key : str
+            Empreinte du filtre, cf. :py:meth:`OgcFilter.hash`.
+        matches : int
+            Le nombre de fiches.
+
+        """
+        with self._lock:
+            self._load()
+            self._data.setdefault(url_csw, {})[key] = [matches, time()]
+            self._dirty = True
+
+    def clear(self, url_csw=None):
+        """Oublie les dénombrements mémorisés.
+
+        Parameters
+        ----------
+        url_csw : str, optional
+            Si fourni, seuls les dénombrements relatifs
+            au serveur considéré sont oubliés.
+
+        """
+        with self._lock:
+            self._load()
+            if url_csw:
+                self._data.pop(url_csw, None)
+            else:
+                self._data.clear()
+            self._dirty = True
+
+    def save(self):
+        """Sauvegarde les dénombrements, s'ils ont été modifiés.
+
+        Les dénombrements périmés ne sont pas conservés.
+
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time()
+            self._data = {
+                url: entries for url, entries in (
+                    (url, {
+                        key: entry for key, entry in entries.items()
+                        if now - entry[1] < csw_matches_ttl
+                    }) for url, entries in self._data.items()
+                ) if entries
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as dest:
+                json.dump(self._data, dest, ensure_ascii=False)
+            tmp.replace(self.path)
+            self._dirty = False
+
+
+matches_cache = MatchesCache(Path(__path__[0]) / 'cache' / 'csw_matches.json')
+"""Mémoire des dénombrements de fiches utilisée par :py:meth:`OgcFilter.csw_matches`."""
+
+
+class CswSlot:
+    """Limite des requêtes simultanées sur un hôte CSW.
+
+    S'utilise comme un sémaphore, dans un bloc ``with``.
+    Contrairement à un sémaphore, la limite peut évoluer
+    alors que des requêtes sont en cours : les suivantes
+    attendent que le nombre de requêtes en cours repasse
+    sous la nouvelle limite. Cf. :py:func:`csw_slot`.
+
+    Attributes
+    ----------
+    limit : int or None
+        Nombre maximal de requêtes simultanées configuré pour
+        l'hôte, soit la plus basse des valeurs de
+        :py:attr:`CswRecord.concurrency` de ses serveurs. None
+        si aucune n'est renseignée, auquel cas la valeur
+        courante de :py:data:`csw_concurrency` s'applique.
+    active : int
+        Nombre de requêtes en cours.
+
+    """
+
+    def __init__(self):
+        self.limit = None
+        self.active = 0
+        self._condition = threading.Condition()
+
+    def restrict(self, limit):
+        """Prend en compte la limite configurée pour un serveur de l'hôte.
+
+        La limite de l'hôte est la plus basse des limites
+        configurées pour ses serveurs.
+
+        Parameters
+        ----------
+        limit : int
+            Nombre maximal de requêtes simultanées.
+
+        """
+        with self._condition:
+            if self.limit is None or limit < self.limit:
+                self.limit = limit
+
+    def __enter__(self):
+        with self._condition:
+            while self.active >= (self.limit or csw_concurrency):
+                self._condition.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+_csw_clients = {}
+_csw_clients_lock = threading.Lock()
+
+def csw_client(url_csw, ttl=None):
+    """Renvoie un client pour un serveur CSW.
+
+    La construction d'un client :py:class:`owslib.csw.CatalogueServiceWeb`
+    implique le téléchargement et l'analyse du document GetCapabilities
+    du serveur. La fonction conserve, pour chaque URL, le dernier client
+    construit, et renvoie une copie de celui-ci tant que ses capacités
+    ne sont pas périmées. Chaque copie porte ses propres requêtes et
+    résultats, elle peut donc être utilisée indépendamment des autres,
+    y compris depuis un autre fil d'exécution.
+
+    Les requêtes du client sont soumises au délai d'attente
+    :py:data:`csw_timeout`.
+
+    Parameters
+    ----------
+    url_csw : str
+        URL du serveur CSW sans aucun paramètre.
+    ttl : float, optional
+        Durée de validité des capacités mémorisées, en secondes.
+        Par défaut, :py:data:`csw_capabilities_ttl`. ``0`` pour
+        forcer le rechargement des capacités.
+
+    Returns
+    -------
+    owslib.csw.CatalogueServiceWeb
+
+    """
+    ttl = csw_capabilities_ttl if ttl is None else ttl
+    with _csw_clients_lock:
+        entry = _csw_clients.get(url_csw)
+    if entry is None or monotonic() - entry[0] >= ttl:
+        entry = (monotonic(), CatalogueServiceWeb(url_csw, timeout=csw_timeout))
+        with _csw_clients_lock:
+            _csw_clients[url_csw] = entry
+    return copy(entry[1])
+
+_csw_local = threading.local()
+
+def csw_hits(url_csw, ogc_filter):
+    """Dénombre les fiches de métadonnées renvoyées par un filtre sur un CSW.
+
+    La fonction envoie une requête GetRecords ``resultType="hits"``,
+    pour laquelle le serveur ne renvoie aucune fiche, et ne lit
+    de la réponse que l'attribut ``numberOfRecordsMatched``, sans
+    attendre la fin du document. Le corps de la requête est mémorisé
+    pour chaque filtre. L'adresse à laquelle la requête est envoyée
+    est celle qu'annoncent les capacités du serveur (cf.
+    :py:func:`csw_client`).
+
+    Contrairement à :py:meth:`OgcFilter.csw_matches`, cette
+    fonction ne mémorise pas les résultats et ne renouvelle
+    pas la requête en cas d'échec.
+
+    Parameters
+    ----------
+    url_csw : str
+        URL du serveur CSW sans aucun paramètre.
+    ogc_filter : OgcFilter
+        Le filtre, de préférence sous forme canonique
+        (cf. :py:meth:`OgcFilter.canonical`).
+
+    Returns
+    -------
+    int
+        Nombre de fiches.
+
+    Raises
+    ------
+    ValueError
+        Si le serveur renvoie une exception OWS ou une réponse
+        qui ne contient pas de dénombrement.
+    requests.RequestException
+        En cas d'échec de la requête HTTP.
+
+    """
+    session = getattr(_csw_local, 'session', None)
+    if session is None:
+        session = _csw_local.session = requests.Session()
+    with session.post(
+        _csw_post_url(url_csw),
+        data=_hits_body(ogc_filter.key()),
+        headers={'Content-Type': 'application/xml'},
+        timeout=csw_timeout,
+        stream=True
+        ) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True
+        for event, elem in iterparse(r.raw, events=('start', 'end')):
+            tag = elem.tag.rsplit('}', 1)[-1]
+            if event == 'start' and tag == 'SearchResults':
+                return int(elem.get('numberOfRecordsMatched'))
+            if event == 'end' and tag == 'ExceptionText':
+                raise ValueError("Le serveur CSW '{}' a renvoyé " \
+                    "une exception : {}".format(url_csw, elem.text))
+    raise ValueError("La réponse du serveur CSW '{}' ne contient " \
+        "pas de dénombrement.".format(url_csw))
+
+def _csw_post_url(url_csw):
+    try:
+        op = csw_client(url_csw).get_operation_by_name('GetRecords')
+        posts = [ m.get('url') for m in op.methods \
+            if m.get('type').lower() == 'post' ]
+    except Exception:
+        posts = None
+    return posts[0] if posts else url_csw
+
+@lru_cache(maxsize=4096)
+def _hits_body(key):
+    root = etree.Element(nspath_eval('csw:GetRecords', csw_namespaces),
+        nsmap={ k: csw_namespaces[k] for k in ('csw', 'ogc', 'gml', 'xsi') })
+    root.set('service', 'CSW')
+    root.set('version', '2.0.2')
+    root.set('resultType', 'hits')
+    root.set(nspath_eval('xsi:schemaLocation', csw_namespaces), schema_location)
+    query = etree.SubElement(root, nspath_eval('csw:Query', csw_namespaces))
+    query.set('typeNames', 'csw:Record')
+    etree.SubElement(query, nspath_eval('csw:ElementSetName',
+        csw_namespaces)).text = 'brief'
+    constraints = parse_constraints(json.loads(key))
+    if constraints:
+        node = etree.SubElement(query, nspath_eval('csw:Constraint', csw_namespaces))
+        node.set('version', '1.1.0')
+        node.append(FilterRequest().setConstraintList(constraints))
+    return element_to_string(root, encoding='utf-8')
+
+_csw_slots = {}
+
+def csw_slot(url_csw, concurrency=None):
+    """Renvoie l'objet limitant les requêtes simultanées sur l'hôte d'un serveur CSW.
+
+    Les serveurs hébergés sur un même hôte partagent le même
+    objet, qui n'est jamais remplacé, de sorte que les requêtes
+    en cours restent décomptées. Sa limite est la plus basse des
+    valeurs de :py:attr:`CswRecord.concurrency` des serveurs de
+    l'hôte, qui sont prises en compte dès l'initialisation des
+    enregistrements. À défaut, c'est la valeur courante de
+    :py:data:`csw_concurrency`.
+
+    Parameters
+    ----------
+    url_csw : str
+        URL du serveur CSW.
+    concurrency : int, optional
+        Nombre maximal de requêtes simultanées configuré pour
+        ce serveur, en principe :py:attr:`CswRecord.concurrency`.
+        Une valeur non renseignée n'a aucun effet sur la limite
+        de l'hôte.
+
+    Returns
+    -------
+    CswSlot
+
+    """
+    host = urlsplit(url_csw).netloc
+    with _csw_clients_lock:
+        slot = _csw_slots.get(host)
+        if slot is None:
+            slot = _csw_slots[host] = CswSlot()
+    if concurrency:
+        slot.restrict(concurrency)
+    return slot
+
 def apiannuaire_get(org_type):
     """Interroge l'API Annuaire pour un type d'établissement donné.
 
@@ -2246,6 +3317,9 @@ def clean_name(name):
     return cname
 
 
+def _term_key(term):
+    return json.dumps(term, ensure_ascii=False, sort_keys=True)
+
 def format_filter(filter_elements, format_function):
     """Applique la fonction de formatage au fragment de filtre.
 
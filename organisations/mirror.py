@@ -0,0 +1,591 @@
+"""Miroir local des métadonnées des serveurs CSW.
+
+Le miroir est une base SQLite qui conserve, pour chaque fiche de
+métadonnées des serveurs CSW, les propriétés utilisées par les
+filtres des moissonnages (``Identifier``, ``OrganisationName``,
+``dc:type``, ``Subject``) et sa date de dernière modification.
+Il permet de dénombrer localement les fiches renvoyées par un
+filtre OGC (:py:class:`organisations.admin.OgcFilter`), sans
+interroger les serveurs :
+
+    >>> mirror = CswMirror()
+    >>> mirror.sync_all(CswCollection())
+    >>> metacollection = MetaCollection(mirror=mirror)
+    >>> metacollection.build_harvest_sources()
+
+La première synchronisation d'un serveur moissonne toutes ses
+fiches. Les suivantes ne portent que sur les fiches modifiées
+depuis la précédente, sauf à demander une synchronisation complète,
+seule à même de prendre en compte les fiches supprimées. Une
+synchronisation complète est également réalisée lorsque la
+précédente date de plus de :py:data:`organisations.admin.mirror_max_age`
+secondes. Au-delà de ce même délai, les dénombrements ne sont
+plus réalisés sur le miroir, cf.
+:py:meth:`organisations.admin.MetaCollection.count`.
+
+Les dénombrements locaux ne sont fiables que dans la mesure où ils
+reproduisent l'interprétation des filtres par les serveurs. Les
+conditions ``PropertyIsLike`` sont évaluées sans tenir compte de la
+casse. Sur les serveurs GéoIDE, un terme sans caractère joker doit
+correspondre à un ou plusieurs mots entiers de la propriété.
+
+"""
+
+import re, sqlite3, threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from random import uniform
+from time import sleep
+
+import requests
+from owslib.catalogue.csw2 import namespaces as csw_namespaces, schema_location
+from owslib.etree import etree
+from owslib.fes import FilterRequest, PropertyIsGreaterThanOrEqualTo
+from owslib.util import element_to_string, nspath_eval
+
+from organisations import __path__
+from organisations import admin
+
+GMD = '{http://www.isotc211.org/2005/gmd}'
+CSW = '{http://www.opengis.net/cat/csw/2.0.2}'
+
+queryables = {
+    'identifier': 'Identifier',
+    'dc:identifier': 'Identifier',
+    'organisationname': 'OrganisationName',
+    'type': 'Type',
+    'dc:type': 'Type',
+    'subject': 'Subject',
+    'dc:subject': 'Subject'
+    }
+"""Propriétés des filtres prises en charge par le miroir.
+
+Les clés sont les noms des propriétés en minuscules, tels
+qu'ils peuvent apparaître dans les filtres, les valeurs les
+noms sous lesquels elles sont enregistrées dans le miroir.
+
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS servers (
+    url TEXT PRIMARY KEY, kind TEXT, synced TEXT, full_synced TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    url TEXT, identifier TEXT, modified TEXT,
+    PRIMARY KEY (url, identifier)
+);
+CREATE TABLE IF NOT EXISTS properties (
+    url TEXT, identifier TEXT, name TEXT, value TEXT, words TEXT
+);
+CREATE INDEX IF NOT EXISTS properties_record
+    ON properties (url, identifier, name);
+"""
+
+class CswMirror:
+    """Miroir local des métadonnées des serveurs CSW.
+
+    Les méthodes peuvent être appelées depuis plusieurs fils
+    d'exécution, chacun disposant de sa propre connexion à la base.
+
+    Parameters
+    ----------
+    path : pathlib.Path or str, optional
+        Chemin de la base SQLite. Par défaut,
+        ``organisations/cache/mirror.sqlite``.
+
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else \
+            Path(__path__[0]) / 'cache' / 'mirror.sqlite'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        columns = [ row[1] for row in conn.execute('PRAGMA table_info(servers)') ]
+        if not 'full_synced' in columns:
+            # base créée par une version antérieure, la date de la
+            # dernière synchronisation complète est inconnue
+            conn.execute('ALTER TABLE servers ADD COLUMN full_synced TEXT')
+            conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path)
+            conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def synced(self, url_csw):
+        """Renvoie la date de dernière synchronisation d'un serveur.
+
+        Parameters
+        ----------
+        url_csw : str
+            URL du serveur CSW.
+
+        Returns
+        -------
+        str or None
+            La date, au format ISO 8601, ou None si le serveur
+            n'a jamais été synchronisé.
+
+        """
+        row = self._connection().execute(
+            'SELECT synced FROM servers WHERE url = ?', (url_csw,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def age(self, url_csw):
+        """Renvoie l'ancienneté de la dernière synchronisation complète d'un serveur.
+
+        Seule une synchronisation complète prend en compte les
+        fiches supprimées du serveur. C'est donc elle qui
+        détermine la fiabilité des dénombrements du miroir.
+
+        Parameters
+        ----------
+        url_csw : str
+            URL du serveur CSW.
+
+        Returns
+        -------
+        float or None
+            L'ancienneté, en secondes, ou None si le serveur
+            n'a jamais été complètement synchronisé.
+
+        """
+        row = self._connection().execute(
+            'SELECT full_synced FROM servers WHERE url = ?', (url_csw,)
+            ).fetchone()
+        if not row or not row[0]:
+            return None
+        full_synced = datetime.strptime(row[0], '%Y-%m-%dT%H:%M:%SZ') \
+            .replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - full_synced).total_seconds()
+
+    def _since(self, url_csw):
+        """Renvoie la borne inférieure des dates de modification pour une synchronisation incrémentale.
+
+        Les dates de modification des fiches sont celles du serveur,
+        souvent sans heure ou en heure locale sans fuseau horaire. La
+        borne est donc une date sans heure, antérieure d'un jour à la
+        plus récente des dates de modification des fiches du miroir
+        pour ce serveur, et dans tous les cas à la date de la
+        précédente synchronisation.
+
+        Parameters
+        ----------
+        url_csw : str
+            URL du serveur CSW.
+
+        Returns
+        -------
+        str or None
+            La date, au format ``YYYY-MM-DD``, ou None si le
+            serveur n'a jamais été synchronisé.
+
+        """
+        synced = self.synced(url_csw)
+        if not synced:
+            return None
+        days = [datetime.strptime(synced[:10], '%Y-%m-%d')]
+        newest = self._connection().execute(
+            'SELECT MAX(modified) FROM records WHERE url = ?', (url_csw,)
+            ).fetchone()[0]
+        try:
+            days.append(datetime.strptime(newest[:10], '%Y-%m-%d'))
+        except (TypeError, ValueError):
+            pass
+        return (min(days) - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    def sync(self, url_csw, kind='geonetwork', full=False, page_size=100,
+        concurrency=None, maxtrials=30, verbose=True):
+        """Synchronise le miroir avec un serveur CSW.
+
+        Parameters
+        ----------
+        url_csw : str
+            URL du serveur CSW sans aucun paramètre.
+        kind : str, default 'geonetwork'
+            Le type de serveur, cf. :py:attr:`organisations.admin.CswRecord.kind`.
+        full : bool, default False
+            Si True, toutes les fiches du serveur sont moissonnées
+            et celles qui n'y figurent plus sont retirées du miroir.
+            Sinon, seules les fiches modifiées depuis la précédente
+            synchronisation sont moissonnées, avec une marge, cf.
+            :py:meth:`CswMirror._since`. La synchronisation
+            est toujours complète si le serveur n'a jamais été
+            complètement synchronisé ou si la dernière
+            synchronisation complète date de plus de
+            :py:data:`organisations.admin.mirror_max_age` secondes.
+        page_size : int, default 100
+            Nombre de fiches demandées par requête.
+        concurrency : int, optional
+            Nombre maximal de requêtes simultanées sur l'hôte
+            du serveur, cf. :py:func:`organisations.admin.csw_slot`.
+        maxtrials : int, default 30
+            Nombre maximal de tentatives pour chaque page, cf.
+            :py:meth:`organisations.admin.OgcFilter.csw_matches`.
+        verbose : bool, default True
+            Si True, le nombre de fiches moissonnées est imprimé
+            dans la console.
+
+        Returns
+        -------
+        int
+            Le nombre de fiches moissonnées.
+
+        Raises
+        ------
+        organisations.admin.CswUnavailableError
+            Si le serveur est considéré comme hors service.
+
+        Notes
+        -----
+        Les fiches sont enregistrées par lots de
+        :py:data:`organisations.admin.mirror_commit_pages` pages.
+        La suppression des fiches qui n'existent plus et les dates
+        de synchronisation ne sont enregistrées qu'à l'issue d'une
+        synchronisation réussie. En cas d'échec, les fiches déjà
+        enregistrées sont conservées et la synchronisation suivante
+        repart de la date de la précédente synchronisation réussie.
+
+        """
+        if not full:
+            age = self.age(url_csw)
+            full = age is None or admin.mirror_max_age is not None \
+                and age > admin.mirror_max_age
+        since = None if full else self._since(url_csw)
+        started = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        constraints = [PropertyIsGreaterThanOrEqualTo('Modified', since)] \
+            if since else []
+        conn = self._connection()
+        seen = set()
+        start = 1
+        pages = 0
+
+        try:
+            while start:
+                page, start = _get_records(url_csw, constraints, start, page_size,
+                    concurrency=concurrency, maxtrials=maxtrials)
+                for record in page:
+                    seen.add(record['Identifier'][0])
+                    self._store(conn, url_csw, kind, record)
+                pages += 1
+                if pages % admin.mirror_commit_pages == 0:
+                    conn.commit()
+        except:
+            # seul le lot en cours est perdu
+            conn.rollback()
+            raise
+
+        with conn:
+            if since is None:
+                # synchronisation complète, les fiches qui n'ont
+                # pas été vues n'existent plus sur le serveur
+                for (identifier,) in conn.execute(
+                    'SELECT identifier FROM records WHERE url = ?',
+                    (url_csw,)).fetchall():
+                    if not identifier in seen:
+                        self._delete(conn, url_csw, identifier)
+            conn.execute(
+                'INSERT OR REPLACE INTO servers (url, kind, synced, full_synced)' \
+                ' VALUES (?, ?, ?, COALESCE(?, (SELECT full_synced FROM servers' \
+                ' WHERE url = ?)))',
+                (url_csw, kind, started, None if since else started, url_csw)
+                )
+
+        if verbose:
+            print("{} : {} fiche(s) moissonnée(s).".format(url_csw, len(seen)))
+        return len(seen)
+
+    def sync_all(self, csw, full=False, verbose=True, strict=False):
+        """Synchronise le miroir avec tous les serveurs d'un répertoire.
+
+        Parameters
+        ----------
+        csw : organisations.admin.CswCollection
+            Le répertoire des serveurs CSW.
+        full : bool, default False
+            Cf. :py:meth:`CswMirror.sync`.
+        verbose : bool, default True
+            Si True, les actions réalisées sont imprimées au fur et à
+            mesure dans la console.
+        strict : bool, default False
+            Si True, l'échec de la synchronisation d'un serveur
+            provoque une erreur. Sinon, le serveur est ignoré.
+
+        """
+        for url, record in csw.items():
+            try:
+                self.sync(url, kind=record.kind, full=full,
+                    concurrency=record.concurrency, maxtrials=record.maxtrials,
+                    verbose=verbose)
+            except Exception as err:
+                if strict:
+                    raise err
+                if verbose:
+                    print("{} : échec de la synchronisation ({}).".format(url, err))
+
+    def count(self, url_csw, ogc_filter):
+        """Dénombre les fiches du miroir renvoyées par un filtre.
+
+        Parameters
+        ----------
+        url_csw : str
+            URL du serveur CSW.
+        ogc_filter : organisations.admin.OgcFilter
+            Le filtre.
+
+        Returns
+        -------
+        int
+            Nombre de fiches.
+
+        Raises
+        ------
+        ValueError
+            Si le serveur n'a jamais été synchronisé, ou si le
+            filtre fait appel à un opérateur ou une propriété
+            que le miroir ne prend pas en charge.
+
+        """
+        conn = self._connection()
+        row = conn.execute(
+            'SELECT kind FROM servers WHERE url = ?', (url_csw,)
+            ).fetchone()
+        if not row:
+            raise ValueError("Le serveur CSW '{}' n'a pas été " \
+                "synchronisé.".format(url_csw))
+        where, params = compile_filter(ogc_filter, words=(row[0] == 'geoide'))
+        return conn.execute(
+            'SELECT COUNT(*) FROM records r WHERE r.url = ? AND ({})'.format(where),
+            [url_csw] + params
+            ).fetchone()[0]
+
+    def _store(self, conn, url_csw, kind, record):
+        identifier = record['Identifier'][0]
+        self._delete(conn, url_csw, identifier)
+        conn.execute(
+            'INSERT INTO records (url, identifier, modified) VALUES (?, ?, ?)',
+            (url_csw, identifier, record['Modified'])
+            )
+        conn.executemany(
+            'INSERT INTO properties (url, identifier, name, value, words)' \
+            ' VALUES (?, ?, ?, ?, ?)',
+            [ (url_csw, identifier, name, value.lower(), _words(value)) \
+                for name in ('Identifier', 'OrganisationName', 'Type', 'Subject') \
+                for value in record[name] ]
+            )
+
+    def _delete(self, conn, url_csw, identifier):
+        for table in ('records', 'properties'):
+            conn.execute(
+                'DELETE FROM {} WHERE url = ? AND identifier = ?'.format(table),
+                (url_csw, identifier)
+                )
+
+
+def compile_filter(ogc_filter, words=False):
+    """Traduit un filtre OGC en condition SQL sur le miroir.
+
+    Parameters
+    ----------
+    ogc_filter : list
+        Un filtre OGC, cf. :py:class:`organisations.admin.OgcFilter`.
+    words : bool, default False
+        Si True, un terme ``PropertyIsLike`` sans caractère joker
+        doit correspondre à un ou plusieurs mots entiers de la
+        propriété (comportement des serveurs GéoIDE).
+
+    Returns
+    -------
+    tuple(str, list)
+        La condition SQL, portant sur la table ``records``
+        désignée par l'alias ``r``, et ses paramètres.
+
+    Raises
+    ------
+    ValueError
+        Si le filtre fait appel à un opérateur ou une propriété
+        que le miroir ne prend pas en charge.
+
+    """
+    if not ogc_filter:
+        return '1', []
+    ors = []
+    params = []
+    for e in ogc_filter:
+        ands = []
+        for term in ([e] if isinstance(e[0], str) else e):
+            sql, term_params = _compile_term(term, words)
+            ands.append(sql)
+            params += term_params
+        ors.append('({})'.format(' AND '.join(ands)))
+    return ' OR '.join(ors), params
+
+def _compile_term(term, words):
+    args = list(term)
+    neg = args[0].lower() == 'not'
+    if neg:
+        del args[0]
+    options = args.pop() if isinstance(args[-1], dict) else {}
+    if len(args) != 3:
+        raise ValueError("Condition non prise en charge : {}.".format(term))
+    operator, prop, literal = args
+    name = queryables.get(prop.lower())
+    if not name:
+        raise ValueError("Propriété non prise en charge : {}.".format(prop))
+
+    if operator == 'PropertyIsEqualTo':
+        test, value = 'p.value = ?', literal.lower()
+    elif operator == 'PropertyIsLike':
+        pattern, text = _like_pattern(literal.lower(),
+            options.get('wildCard', '%'), options.get('singleChar', '_'),
+            options.get('escapeChar', '\\'))
+        if words and text is not None:
+            test = "p.words LIKE ? ESCAPE '\\'"
+            value = '% {} %'.format(_like_escape(_words(text).strip()))
+        else:
+            test, value = "p.value LIKE ? ESCAPE '\\'", pattern
+    else:
+        raise ValueError("Opérateur non pris en charge : {}.".format(operator))
+
+    sql = 'EXISTS (SELECT 1 FROM properties p WHERE p.url = r.url' \
+        ' AND p.identifier = r.identifier AND p.name = ? AND {})'.format(test)
+    return ('NOT ' if neg else '') + sql, [name, value]
+
+def _like_pattern(literal, wild, single, escape):
+    # traduction d'un motif OGC en motif LIKE (joker %,
+    # caractère quelconque _ et caractère d'échappement \),
+    # accompagné du littéral débarrassé de ses caractères
+    # d'échappement, ou de None s'il contient un joker
+    pattern = []
+    text = []
+    chars = iter(literal)
+    for c in chars:
+        if c == escape:
+            c = next(chars, '')
+        elif c == wild or c == single:
+            pattern.append('%' if c == wild else '_')
+            text = None
+            continue
+        pattern.append(_like_escape(c))
+        if text is not None:
+            text.append(c)
+    return ''.join(pattern), None if text is None else ''.join(text)
+
+def _like_escape(value):
+    return re.sub(r'([%_\\])', r'\\\1', value)
+
+def _words(value):
+    return ' {} '.format(' '.join(re.findall(r'\w+', value.lower())))
+
+_csw_local = threading.local()
+
+def _get_records(url_csw, constraints, start, page_size, concurrency=None,
+    maxtrials=30):
+    """Moissonne une page de fiches.
+
+    Le nombre de requêtes simultanées sur l'hôte du serveur est
+    limité par :py:func:`organisations.admin.csw_slot`, selon
+    `concurrency`. Comme pour
+    :py:meth:`organisations.admin.OgcFilter.csw_matches`, la requête
+    est répétée jusqu'à `maxtrials` fois en cas d'échec, avec un
+    délai aléatoire croissant, et l'état du serveur est tenu à jour
+    dans :py:data:`organisations.admin.csw_health`.
+
+    Returns
+    -------
+    tuple(list of dict, int)
+        Les fiches et la position de la première fiche de la
+        page suivante, 0 s'il s'agissait de la dernière page.
+
+    Raises
+    ------
+    organisations.admin.CswUnavailableError
+        Si le serveur est considéré comme hors service.
+
+    """
+    session = getattr(_csw_local, 'session', None)
+    if session is None:
+        session = _csw_local.session = requests.Session()
+    error = None
+    for trial in range(admin.csw_health.trials(url_csw, maxtrials)):
+        if trial:
+            sleep(uniform(0, min(admin.csw_backoff_max,
+                admin.csw_backoff * 2 ** (trial - 1))))
+        if not admin.csw_health.available(url_csw):
+            raise admin.CswUnavailableError("Le serveur CSW '{}' est " \
+                "considéré comme hors service.".format(url_csw))
+        try:
+            with admin.csw_slot(url_csw, concurrency):
+                r = session.post(
+                    admin._csw_post_url(url_csw),
+                    data=_records_body(constraints, start, page_size),
+                    headers={'Content-Type': 'application/xml'},
+                    timeout=admin.csw_timeout
+                    )
+            r.raise_for_status()
+            root = etree.fromstring(r.content)
+        except Exception as err:
+            admin.csw_health.record(url_csw, False)
+            error = err
+            continue
+        admin.csw_health.record(url_csw, True)
+        break
+    else:
+        raise error
+    results = root.find(CSW + 'SearchResults')
+    if results is None:
+        raise ValueError("La réponse du serveur CSW '{}' ne contient " \
+            "pas de fiches.".format(url_csw))
+    records = [ _parse_record(md) for md in results \
+        if md.tag.endswith('}MD_Metadata') or md.tag.endswith('}MI_Metadata') ]
+    records = [ record for record in records if record['Identifier'] ]
+    next_record = int(results.get('nextRecord') or 0)
+    if not len(results) or next_record <= start \
+        or next_record > int(results.get('numberOfRecordsMatched')):
+        next_record = 0
+    return records, next_record
+
+def _records_body(constraints, start, page_size):
+    root = etree.Element(nspath_eval('csw:GetRecords', csw_namespaces),
+        nsmap={ k: csw_namespaces[k] for k in ('csw', 'gmd', 'ogc', 'gml', 'xsi') })
+    root.set('service', 'CSW')
+    root.set('version', '2.0.2')
+    root.set('resultType', 'results')
+    root.set('outputSchema', csw_namespaces['gmd'])
+    root.set('startPosition', str(start))
+    root.set('maxRecords', str(page_size))
+    root.set(nspath_eval('xsi:schemaLocation', csw_namespaces), schema_location)
+    query = etree.SubElement(root, nspath_eval('csw:Query', csw_namespaces))
+    query.set('typeNames', 'gmd:MD_Metadata')
+    etree.SubElement(query, nspath_eval('csw:ElementSetName',
+        csw_namespaces)).text = 'full'
+    if constraints:
+        node = etree.SubElement(query, nspath_eval('csw:Constraint', csw_namespaces))
+        node.set('version', '1.1.0')
+        node.append(FilterRequest().setConstraintList(constraints))
+    return element_to_string(root, encoding='utf-8')
+
+def _parse_record(md):
+    """Extrait d'une fiche ISO 19139 les propriétés utiles aux filtres."""
+    def text(elem):
+        return ''.join(elem.itertext()).strip() if elem is not None else ''
+
+    identifier = text(md.find(GMD + 'fileIdentifier'))
+    types = [ e.get('codeListValue') for e in \
+        md.findall('{0}hierarchyLevel/{0}MD_ScopeCode'.format(GMD)) \
+        if e.get('codeListValue') ] or ['dataset']
+    subjects = [ text(e) for e in md.iter(GMD + 'keyword') ] + \
+        [ text(e) for e in md.iter(GMD + 'MD_TopicCategoryCode') ]
+    return {
+        'Identifier': [identifier] if identifier else [],
+        'OrganisationName': sorted({ text(e) for e in \
+            md.iter(GMD + 'organisationName') } - {''}),
+        'Type': types,
+        'Subject': sorted(set(subjects) - {''}),
+        'Modified': text(md.find(GMD + 'dateStamp'))
+        }